@@ -1,6 +1,8 @@
 #! /usr/bin/env python
 
 
+import multiprocessing
+
 from morseus import Morseus
 
 
@@ -10,4 +12,6 @@ class MorseusApp(Morseus):
 
 
 if __name__ == "__main__":
+    # Needed by frozen executables when decoding into a separate process.
+    multiprocessing.freeze_support()
     MorseusApp().run()
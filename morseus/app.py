@@ -1,18 +1,39 @@
 """Morseus application controller."""
 
 
+import os
+
 from kivy.app import App
+from kivy.base import ExceptionHandler, ExceptionManager
 
-from morseus import settings
+from morseus import logs, settings
 from morseus.nui import MorseusLayout
 
 
+class LogsDumper(ExceptionHandler):
+
+    """Save the buffered log records when the app crashes."""
+
+    def __init__(self, path):
+        super(LogsDumper, self).__init__()
+        self._path = path
+
+    def handle_exception(self, exception):
+        logs.dump(self._path)
+        return ExceptionManager.RAISE
+
+
 class Morseus(App):
 
     def build(self):
         self.icon = settings.ICON
+        dump_path = os.path.join(self.user_data_dir,
+                                 settings.LOGGING.BUFFER.DUMP)
+        ExceptionManager.add_handler(LogsDumper(dump_path))
         return MorseusLayout()
 
     def on_stop(self):
         # Stop sending Morse signals in case we're doing that.
         self.root.stop_sending()
+        # Write the last received letters and signals.
+        self.root.close_receiver()
@@ -0,0 +1,166 @@
+"""Keep logging off the hot path through in-memory ring buffers."""
+
+
+import atexit
+import collections
+import logging
+import threading
+
+from morseus import settings
+
+
+BUFFER = settings.LOGGING.BUFFER
+
+# Every ring buffer handler created so far.
+_handlers = []
+_handlers_lock = threading.Lock()
+
+
+class RingBufferHandler(logging.Handler):
+
+    """Store raw log records into a bounded buffer, while a background thread
+    formats and writes them in batches through the `targets` handlers.
+    """
+
+    def __init__(self, targets, capacity=BUFFER.CAPACITY,
+                 period=BUFFER.PERIOD):
+        logging.Handler.__init__(self)
+        self._targets = []
+        # Records waiting to be written and most recent ones for dumping.
+        self._pending = collections.deque(maxlen=capacity)
+        self._history = collections.deque(maxlen=capacity)
+        # Records lost because the writer didn't keep up.
+        self.dropped = 0
+        self._write_lock = threading.Lock()
+        for target in targets:
+            self.add_target(target)
+
+        self._period = period
+        self._start()
+
+    def _start(self):
+        self._stop_event = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="log-writer")
+        self._writer.daemon = True
+        self._writer.start()
+
+    def restart(self):
+        """Start over in a forked child, where the writer thread is missing
+        and the locks might have been held by it at fork time.
+        """
+        self.createLock()
+        self._write_lock = threading.Lock()
+        for target in self._targets:
+            target.createLock()
+        # The parent writes what it had pending.
+        self._pending.clear()
+        self._start()
+
+    def add_target(self, target):
+        self._targets.append(target)
+        # Don't even store what no target would write.
+        self.setLevel(min(handler.level for handler in self._targets))
+
+    def emit(self, record):
+        # No formatting and no I/O in here.
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append(record)
+        self._history.append(record)
+
+    def _write(self):
+        with self._write_lock:
+            batch = []
+            while self._pending:
+                batch.append(self._pending.popleft())
+            if not batch:
+                return
+
+            for target in self._targets:
+                for record in batch:
+                    if record.levelno >= target.level:
+                        target.handle(record)
+                target.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self._period):
+            self._write()
+        self._write()
+
+    def flush(self):
+        self._write()
+
+    def dump(self, stream):
+        """Write all the recent records into `stream`."""
+        formatter = self.formatter or logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        for record in list(self._history):
+            stream.write(formatter.format(record) + "\n")
+
+    def close(self):
+        self._stop_event.set()
+        if self._writer is not threading.current_thread():
+            self._writer.join()
+        for target in self._targets:
+            target.close()
+        logging.Handler.close(self)
+
+
+def offload(name=BUFFER.LOGGER):
+    """Move the handlers of the `name` logger and of its children behind
+    ring buffers (idempotent, call it after handlers are added).
+    """
+    if not (settings.LOGGING.USE and BUFFER.ENABLE):
+        return
+
+    loggers = [logging.getLogger(name)]
+    loggers.extend(
+        logger for key, logger in logging.Logger.manager.loggerDict.items()
+        if key.startswith(name + ".") and isinstance(logger, logging.Logger)
+    )
+    with _handlers_lock:
+        for logger in loggers:
+            rings = [handler for handler in logger.handlers
+                     if isinstance(handler, RingBufferHandler)]
+            targets = [handler for handler in logger.handlers
+                       if not isinstance(handler, RingBufferHandler)]
+            if not targets:
+                continue
+
+            for target in targets:
+                logger.removeHandler(target)
+            if rings:
+                for target in targets:
+                    rings[0].add_target(target)
+            else:
+                ring = RingBufferHandler(targets)
+                logger.addHandler(ring)
+                _handlers.append(ring)
+
+
+def dump(path):
+    """Write the recent records of every ring buffer into `path`."""
+    with _handlers_lock:
+        handlers = list(_handlers)
+    with open(path, "w") as stream:
+        for handler in handlers:
+            handler.dump(stream)
+
+
+def restart():
+    """Rebuild the ring buffers inherited by a forked process, which then
+    has to `close` them itself before exiting.
+    """
+    global _handlers_lock
+
+    _handlers_lock = threading.Lock()
+    for handler in _handlers:
+        handler.restart()
+
+
+@atexit.register
+def close():
+    """Write everything left and stop the writers."""
+    with _handlers_lock:
+        while _handlers:
+            _handlers.pop().close()
@@ -0,0 +1,127 @@
+"""Simulated Encoder to Decoder loopback running on a virtual clock."""
+
+
+import argparse
+import collections
+import difflib
+import threading
+import time
+
+import numpy
+from PIL import Image
+
+from morseus import process, render, settings, timing
+
+
+RENDER = settings.RENDER
+LOOPBACK = settings.LOOPBACK
+
+
+Result = collections.namedtuple(
+    "Result",
+    ["unit", "noise", "text", "decoded", "accuracy", "simulated", "elapsed"]
+)
+
+
+class SyntheticCamera(object):
+
+    """Film the transmitter state into frames fed to a decoder."""
+
+    def __init__(self, clock, decoder, fps=RENDER.FPS, size=RENDER.SIZE,
+                 spot=RENDER.SPOT, noise=0.0, blur=0.0, seed=None):
+        self._decoder = decoder
+        self._state = False
+        self._spot = render.get_spot_image(size, spot, blur) * 255
+        self._noise = noise
+        self._rand = numpy.random.RandomState(seed)
+        self._event = clock.schedule_interval(self.capture, 1.0 / fps)
+
+    def display(self, state):
+        """Signal function for the `Encoder`."""
+        self._state = state
+
+    def capture(self, delta):
+        frame = self._spot * self._state
+        if self._noise:
+            frame = frame + self._rand.normal(
+                0, self._noise * 255, frame.shape)
+        frame = numpy.clip(frame, 0, 255).astype(numpy.uint8)
+        self._decoder.process_image(Image.fromarray(frame), delta)
+
+    def stop(self):
+        self._event.cancel()
+
+
+def _normalize(text):
+    return " ".join(text.upper().split())
+
+
+def run(text, unit=settings.UNIT, noise=0.0, seed=None, **camera_kwargs):
+    """Send `text` through a synthetic camera into a new decoder and return
+    the outcome.
+    """
+    started = time.time()
+    clock = timing.VirtualClock()
+    decoder = process.Decoder(False)
+    camera = SyntheticCamera(clock, decoder, noise=noise, seed=seed,
+                             **camera_kwargs)
+    encoder = process.Encoder(text, camera.display, threading.Event(),
+                              decoder, False, False, unit=unit, clock=clock)
+    encoder.start()
+    # Keep filming the silence until the last letter comes out.
+    clock.sleep(LOOPBACK.TAIL * unit / settings.SECOND)
+    camera.stop()
+    decoder.flush()
+    decoded = decoder.get_letters()
+    decoder.close()
+
+    text, decoded = map(_normalize, [text, decoded])
+    accuracy = difflib.SequenceMatcher(None, text, decoded).ratio()
+    return Result(unit, noise, text, decoded, accuracy, clock.time(),
+                  time.time() - started)
+
+
+def sweep(text, units=LOOPBACK.UNITS, noises=LOOPBACK.NOISES, repeat=1,
+          **kwargs):
+    """Yield results for every combination of speed and noise level."""
+    for _ in range(repeat):
+        for unit in units:
+            for noise in noises:
+                yield run(text, unit=unit, noise=noise, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Loopback Morse sending into receiving on simulated time.")
+    parser.add_argument("text", help="text to be sent")
+    parser.add_argument("-u", "--units", type=float, nargs="+",
+                        default=LOOPBACK.UNITS, help="Morse units in ms")
+    parser.add_argument("-n", "--noises", type=float, nargs="+",
+                        default=LOOPBACK.NOISES, help="camera noise levels")
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+                        help="repeat the whole sweep (soak testing)")
+    parser.add_argument("--fps", type=int, default=RENDER.FPS)
+    parser.add_argument("--size", type=int, nargs=2, default=RENDER.SIZE,
+                        metavar=("WIDTH", "HEIGHT"), help="frame size")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    simulated = elapsed = 0.0
+    row = "{:>8} {:>6} {:>9} {:>8}  {}"
+    print(row.format("unit", "noise", "accuracy", "speedup", "decoded"))
+    for result in sweep(args.text, units=args.units, noises=args.noises,
+                        repeat=args.repeat, fps=args.fps,
+                        size=tuple(args.size), seed=args.seed):
+        simulated += result.simulated
+        elapsed += result.elapsed
+        print(row.format(
+            result.unit, result.noise, "{:.2%}".format(result.accuracy),
+            "{:.1f}x".format(result.simulated / result.elapsed),
+            result.decoded
+        ))
+    print("Simulated {:.1f}s in {:.1f}s ({:.1f}x real time).".format(
+        simulated, elapsed, simulated / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,13 @@
 
 
 import itertools
+import os
 import threading
-import time
+import zlib
 
 from PIL import Image
 from kivy.clock import Clock
+from kivy.logger import Logger
 from kivy.uix.camera import Camera
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.textinput import TextInput
@@ -19,7 +21,16 @@ from kivy.properties import (
 )
 from kivy.uix.tabbedpanel import TabbedPanelItem
 
-from morseus import process, settings, utils
+from morseus import (
+    process,
+    profiler,
+    scheduler,
+    settings,
+    signallog,
+    timing,
+    transcript,
+    utils,
+)
 from morseus.settings import LOGGING
 
 
@@ -70,47 +81,95 @@ class MorseusLayout(GridLayout):
     }
 
     output_text = StringProperty()
+    provisional_text = StringProperty()
     input_text = StringProperty()
     transmitter_color = ColorProperty([0] * 3)
     send_button_text = StringProperty(START)
     camera_box_value = NumericProperty()
     adaptive_state = BooleanProperty()
     debug_state = BooleanProperty()
+    search_state = BooleanProperty()
+    profile_state = BooleanProperty(False)
 
     def __init__(self, *args, **kwargs):
         super(MorseusLayout, self).__init__(*args, **kwargs)
 
         self.camera_box_value = int(settings.AREA.RATIO * 100)
         self.debug_state = LOGGING.DEBUG
+        self.search_state = settings.SEARCH.ENABLE
 
-        self._decoder = process.Decoder(self.debug_state)
+        self._decoder = self._create_decoder()
+        self._transcript = self._create_transcript()
         self._send_thread = None
         self._send_stop_tevent = threading.Event()
+        # Single timing thread for the signals of any transmission.
+        self._scheduler = scheduler.Scheduler()
+        self._send_channel = None
+        self._profiler = None
 
         Clock.schedule_interval(self._update_output_text, MORSE_PERIOD)
 
+    @staticmethod
+    def _get_data_dir(name):
+        directory = os.path.join(utils.get_app().user_data_dir, name)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        return directory
+
+    def _create_decoder(self):
+        log_path = None
+        if settings.SIGNAL_LOG.ENABLE:
+            # Record this receiving session.
+            directory = self._get_data_dir(settings.SIGNAL_LOG.DIRECTORY)
+            log_path = signallog.get_log_path(directory)
+        return process.create_decoder(self.debug_state, log_path=log_path)
+
+    def _create_transcript(self):
+        path = None
+        if settings.TRANSCRIPT.SPILL:
+            directory = self._get_data_dir(settings.TRANSCRIPT.DIRECTORY)
+            path = transcript.get_transcript_path(directory)
+        return transcript.Transcript(path)
+
     def _update_output_text(self, *_):
         text = self._decoder.get_letters()
-        self.output_text += text
+        if text:
+            # Only a bounded recent window is kept and rendered.
+            self._transcript.append(text)
+            self.output_text = self._transcript.text
+        self.provisional_text = self._decoder.get_provisional()
 
-    def add_region(self, region, delta):
+    def add_region(self, region, delta, pixels=None):
         """Add new capture of interest to the analyser."""
-        image = Image.frombytes(self.TEXTURE_MODE, region.size, region.pixels)
+        pixels = pixels or region.pixels
+        image = Image.frombytes(self.TEXTURE_MODE, region.size, pixels)
         self._decoder.add_image(image, delta)
 
-    def reset_receiver(self):
-        """Renew the state of the receiver."""
+    def close_receiver(self):
+        """Finish the receiving, keeping everything decoded so far."""
         # First, stop the camera, in order to interrupt the feed.
-        camera = self.ids.morseus_camera
-        camera.play = False
+        self.ids.morseus_camera.play = False
         # Now signal the decoder to finish.
         self._decoder.close()
+        self._update_output_text()
+        self._transcript.close()
+
+    def reset_receiver(self):
+        """Renew the state of the receiver."""
+        self.close_receiver()
         # Recreate the decoding objects.
-        self._decoder = process.Decoder(self.debug_state)
+        self._decoder = self._create_decoder()
         # And finally clear received text so far.
+        self._transcript = self._create_transcript()
         self.output_text = ""
+        self.provisional_text = ""
         # Now turn on back the camera.
-        camera.play = True
+        self.ids.morseus_camera.play = True
+
+    def on_search_state(self, _, value):
+        if not value:
+            # Bring back the focus area into the center.
+            self.ids.morseus_camera.update_center(cache=False)
 
     def _display_signal(self, state):
         """Turn on/off the transmitter (according to `state`) and keep it like
@@ -119,6 +178,10 @@ class MorseusLayout(GridLayout):
         value = int(state)
         self.transmitter_color = [value] * 3
 
+    def _send_finished(self):
+        # The encoder just finished the job on its own or by being stopped.
+        self.send_button_text = self.START
+
     def _send_text(self):
         """Function which runs in a separate thread for text sending."""
         # Create a new alphabet translator and begin to obtain and show light
@@ -133,14 +196,16 @@ class MorseusLayout(GridLayout):
             self.debug_state,
             self.adaptive_state
         )
-        _encoder.start()
-        # The encoder just finished the job on its own or by being stopped.
-        self.send_button_text = self.START
+        # Translation happens here, while the signals timing is left to the
+        # scheduler.
+        self._send_channel = _encoder.schedule(
+            self._scheduler, on_finish=self._send_finished)
 
     def _start_sending(self):
-        # Start the continuous sending process into a new thread.
+        # Prepare the continuous sending process into a new thread.
         self._send_stop_tevent.clear()
-        self._send_thread = threading.Thread(target=self._send_text)
+        self._send_thread = threading.Thread(target=self._send_text,
+                                             name="encoder")
         self._send_thread.start()
 
     def stop_sending(self):
@@ -148,6 +213,32 @@ class MorseusLayout(GridLayout):
         self._send_stop_tevent.set()
         if self._send_thread:
             self._send_thread.join()
+        if self._send_channel:
+            self._send_channel.stop()
+            self._send_channel.wait()
+
+    def _profile_finished(self, path):
+        Logger.info("Morseus: Profile written into %s", path)
+        if self._profiler.incomplete:
+            Logger.warning("Morseus: Profile lacks the decoding process")
+        # Called from the profiler thread, so switch back on the main one.
+        Clock.schedule_once(lambda *_: setattr(self, "profile_state", False))
+
+    def on_profile_state(self, _, value):
+        """Start or stop the profiler through the Options switch."""
+        running = bool(self._profiler and self._profiler.running)
+        if value and not running:
+            # Decoding may happen into a separate process.
+            processes = []
+            if isinstance(self._decoder, process.ProcessDecoder):
+                processes.append(self._decoder)
+            self._profiler = profiler.profile(
+                utils.get_app().user_data_dir,
+                on_finish=self._profile_finished,
+                processes=processes
+            )
+        elif not value and running:
+            self._profiler.stop()
 
     def toggle_send_button(self):
         """Action triggered by the Start/Stop button for text sending."""
@@ -166,6 +257,8 @@ class MorseusCamera(Camera, WidgetMixin):
     _AREA = settings.AREA
     CENTER_RATIO = _AREA.RATIO
     CENTER_WIDTH = _AREA.WIDTH
+    # Time source for computing own deltas.
+    clock = timing.SYSTEM_CLOCK
 
     # Focus rectangle dimensions.
     center_pos = ListProperty([0, 0])
@@ -174,11 +267,22 @@ class MorseusCamera(Camera, WidgetMixin):
     center_updated = BooleanProperty(True)
 
     def __init__(self, *args, **kwargs):
+        resolution = settings.RESOLUTION.DEFAULT
+        if settings.RESOLUTION.NEGOTIATE:
+            resolution = utils.negotiate_resolution(self.CENTER_RATIO)
+        kwargs.setdefault("resolution", resolution)
         super(MorseusCamera, self).__init__(*args, **kwargs)
         self._capture_event = None
         self._center_region = None
         self._center_metrics = None
         self._last_time = None
+        self._next_search = 0
+        # Duplicate frames detection.
+        self._last_frame = None
+        self._last_frame_time = None
+        self._skipped_delta = 0.0
+        # Waiting for the texture of a reopened camera.
+        self._reopening = False
 
     def get_center_metrics(self, size, cache=True):
         """Returns a centered rectangular sub-shape of the given `size`."""
@@ -204,12 +308,50 @@ class MorseusCamera(Camera, WidgetMixin):
 
         return self._center_metrics
 
+    def negotiate_resolution(self):
+        """Switch to the smallest camera mode fitting the current sub-area."""
+        if not settings.RESOLUTION.NEGOTIATE:
+            return
+
+        box_ratio = self.root.camera_box_value / 100.0
+        resolution = utils.negotiate_resolution(box_ratio)
+        if list(resolution) == list(self.resolution):
+            return
+        # The previous camera isn't released when a new one gets created.
+        if self._camera:
+            self._camera.stop()
+        # Focus metrics are following the new texture size, while the last
+        # frame of the old camera mustn't be decoded anymore.
+        self._center_metrics = self._center_region = None
+        self._last_frame = self._last_frame_time = None
+        self._reopening = True
+        self.resolution = resolution
+
+    def search_light(self):
+        """Move the focus area over the brightest spot of the entire frame."""
+        tex = self.texture
+        _, size = self.get_center_metrics(tex.size)
+        # Pixels are read bottom-up, just like the texture coordinates.
+        image = Image.frombytes(self.root.TEXTURE_MODE, tex.size, tex.pixels)
+        window = process.find_light_window(image, size)
+        if window:
+            self._center_metrics = window
+            self.center_updated = True
+            self.update_center()
+
     def capture(self, delta, *_):
         """Capture the current screen and further process the image."""
-        if not self.play:
+        if not self.play or self._reopening:
             self._last_time = None
+            self._last_frame = self._last_frame_time = None
+            self._skipped_delta = 0.0
             return
 
+        now = self.clock.time()
+        if self.root.search_state and now >= self._next_search:
+            self._next_search = now + settings.SEARCH.PERIOD
+            self.search_light()
+
         if not self._center_region or self.center_updated:
             tex = self.texture
             point, size = self.get_center_metrics(tex.size)
@@ -217,24 +359,55 @@ class MorseusCamera(Camera, WidgetMixin):
             self._center_region = tex.get_region(*region_args)
             self.center_updated = False    # not updated anymore
 
-        # Load and further process region as PIL image.
-        now = time.time()
         if settings.TIME_DELTA and self._last_time:
             delta = now - self._last_time
         self._last_time = now
-        self.root.add_region(self._center_region, delta)
+        # Time of the previously skipped captures belongs to this one.
+        delta += self._skipped_delta
+
+        # Check if the camera gave us a new frame since the last capture.
+        core = self._camera
+        frame_id = getattr(core, "frame_count", None)
+        pixels = None
+        if frame_id is None:
+            # Provider without counter, so compare a sparse checksum.
+            pixels = self._center_region.pixels
+            frame_id = zlib.adler32(
+                pixels[::settings.FRAMES.CHECKSUM_STRIDE])
+        new_frame = frame_id != self._last_frame
+        self._last_frame = frame_id
+        if not new_frame and delta < settings.FRAMES.STALE:
+            # Don't decode the same image twice.
+            self._skipped_delta = delta
+            return
+        self._skipped_delta = 0.0
+
+        # Prefer the real time passed between the frames.
+        frame_time = getattr(core, "frame_time", None)
+        if not new_frame:
+            # A stale frame already consumed the time up to now.
+            self._last_frame_time = None
+        elif frame_time:
+            if settings.FRAMES.TIMESTAMPS and self._last_frame_time:
+                delta = frame_time - self._last_frame_time
+            self._last_frame_time = frame_time
+
+        # Load and further process region as PIL image.
+        self.root.add_region(self._center_region, delta, pixels=pixels)
 
     def on_texture(self, *args, **kwargs):
         """Callback for texture loading (usually happens once)."""
         ret = super(MorseusCamera, self).on_texture(*args, **kwargs)
+        self._reopening = False
 
         # Start periodic capturing event.
         if not self._capture_event:
             self._capture_event = Clock.schedule_interval(
                 self.capture, MORSE_PERIOD)
 
-        # Mark the focus area for capturing.
-        self.update_center()
+        # Mark the focus area for capturing (a renegotiated resolution brings
+        # a new texture size).
+        self.update_center(cache=False)
 
         return ret
 
@@ -1,6 +1,8 @@
 """Patch library bad behavior."""
 
 
+import time
+
 import libmorse
 from kivy import utils as kivy_utils
 from kivy.clock import Clock
@@ -30,6 +32,16 @@ def patch_camera(set_provider=CAM.EXPLICIT):
 
     class PatchedCoreCamera(CoreCamera):
 
+        # Count and time of the frames loaded into the texture so far.
+        frame_count = 0
+        frame_time = None
+
+        def on_texture(self, *args, **kwargs):
+            # Providers dispatch this for every newly blitted frame.
+            self.frame_count += 1
+            self.frame_time = time.time()
+            return super(PatchedCoreCamera, self).on_texture(*args, **kwargs)
+
         def start(self, *args, **kwargs):
             ret = super(PatchedCoreCamera, self).start(*args, **kwargs)
 
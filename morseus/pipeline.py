@@ -0,0 +1,279 @@
+"""Configurable stages deciding if a captured frame shows light or dark."""
+
+
+import collections
+import operator
+
+import numpy
+from PIL import ImageFilter
+
+from morseus import settings
+
+
+PIPELINE = settings.PIPELINE
+
+BW_MODE = "L"
+MONO_MODE = "1"
+
+
+class Stage(object):
+
+    """One step of the frame processing.
+
+    Stages are sharing a `frame` dictionary: each of them needs the keys in
+    `requires` and fills the ones in `provides`. The `cache` survives between
+    frames, but only a `sequential` stage gets them strictly in order.
+    """
+
+    name = None
+    requires = ("image",)
+    provides = ()
+    sequential = False    # depends on the previous frames
+
+    def __init__(self):
+        self.cache = {}
+
+    def process(self, frame):
+        """Update the `frame` and return `True` (light) or `False` (dark) when
+        the verdict is certain, `None` otherwise.
+        """
+        raise NotImplementedError()
+
+
+class GrayscaleStage(Stage):
+
+    name = "grayscale"
+    provides = ("image",)
+
+    def process(self, frame):
+        frame["image"] = frame["image"].convert(mode=BW_MODE)
+
+
+class BlurStage(Stage):
+
+    name = "blur"
+    provides = ("image",)
+
+    def process(self, frame):
+        frame["image"] = frame["image"].filter(ImageFilter.BLUR)
+
+
+class ThresholdStage(Stage):
+
+    """Convert to monochrome, optionally adapting the threshold to the
+    brightest pixel of the previous frame.
+    """
+
+    name = "threshold"
+    provides = ("image", "area")
+
+    def __init__(self, threshold=settings.MONO_THRESHOLD,
+                 adaptive=PIPELINE.ADAPTIVE):
+        super(ThresholdStage, self).__init__()
+        self._threshold = threshold
+        self._adaptive = self.sequential = adaptive
+
+    def process(self, frame):
+        image = frame["image"]
+        threshold = self.cache.get("threshold", self._threshold)
+        mono_func = lambda pixel: pixel > threshold and 255
+        frame["image"] = image.point(mono_func, mode=MONO_MODE)
+        frame["area"] = operator.mul(*image.size)
+
+        if self._adaptive:
+            # Prepare the threshold of the next frame.
+            peak = image.getextrema()[1]
+            self.cache["threshold"] = min(
+                self._threshold,
+                max(peak * PIPELINE.PEAK_RATIO, PIPELINE.THRESHOLD_MIN)
+            )
+
+
+class BoundingBoxStage(Stage):
+
+    """Crop the unnecessary void around the light object."""
+
+    name = "bbox"
+    requires = ("image", "area")
+    provides = ("image",)
+
+    def process(self, frame):
+        image = frame["image"]
+        box = image.getbbox()
+        if not box:
+            # Not a single white pixel.
+            return False
+
+        # Check if the new area isn't too small comparing to the original.
+        box_area = operator.mul(
+            *map(lambda pair: abs(box[pair[0]] - box[pair[1]]),
+                 [(0, 2), (1, 3)])
+        )
+        if float(box_area) / frame["area"] > settings.BOX_MIN_RATIO:
+            frame["image"] = image.crop(box=box)
+
+
+class HistogramStage(Stage):
+
+    """Decide through the light vs. dark quantity when it's obvious."""
+
+    name = "histogram"
+    provides = ("light_dark",)
+
+    def __init__(self, ratio=settings.LIGHT_DARK_RATIO):
+        super(HistogramStage, self).__init__()
+        self._ratio = ratio
+
+    def process(self, frame):
+        hist = frame["image"].histogram()
+        blacks = hist[0]
+        if not blacks:
+            return True
+        light_dark = frame["light_dark"] = float(hist[-1]) / blacks
+        if light_dark > self._ratio:
+            return True
+        if not light_dark:
+            return False
+
+
+class CirclesStage(Stage):
+
+    """Check if we have the usual spot & noise pattern."""
+
+    name = "circles"
+    requires = ("image", "area")
+
+    @staticmethod
+    def _flood_fill(image, node, seen):
+        """Find white spots and return their area."""
+        queue = collections.deque()
+        area = 0
+
+        def add_pos(pos):
+            # Check position and retrieve pixel.
+            width, height = image.size
+            valid = 0 <= pos[0] < width and 0 <= pos[1] < height
+            if not valid:
+                return False
+            pixel = image.getpixel(pos)
+            lin, col = pos
+            if not pixel or seen[lin, col]:
+                return False
+            # White pixel detected.
+            queue.append(pos)
+            seen[lin, col] = True
+            return True
+
+        area += add_pos(node)
+        moves = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        while queue:
+            node = queue.pop()
+            for move in moves:
+                adj = tuple(map(sum, zip(node, move)))
+                area += add_pos(adj)
+
+        return area
+
+    @classmethod
+    def _examine_circles(cls, image, img_area):
+        areas = []
+        width, height = image.size
+        # Generate the visiting matrix.
+        seen = numpy.zeros((width, height))
+        # Take each white not visited pixel and identify spot from it.
+        for xpix in range(width):
+            for ypix in range(height):
+                pixel = image.getpixel((xpix, ypix))
+                if not pixel or seen[xpix, ypix]:
+                    continue
+                # We've got a non-visited white pixel.
+                area = cls._flood_fill(image, (xpix, ypix), seen)
+                areas.append(area)
+        if not areas:
+            # No spots detected.
+            return False
+
+        # Now compare all the areas in order to check the pattern.
+        main_area = max(areas)
+        areas.remove(main_area)
+        noise = True    # rest of the spots are just noise
+        for area in areas:
+            ratio = float(area) / main_area
+            if ratio > settings.SPOT_NOISE_RATIO:
+                # Not noise anymore.
+                noise = False
+                break
+
+        # If we remain with the `noise`, then we have a recognized pattern.
+        # Also check if the spot isn't too tiny.
+        ratio = float(main_area) / img_area
+        return noise and ratio > settings.SPOT_MIN_RATIO
+
+    def process(self, frame):
+        return self._examine_circles(frame["image"], frame["area"])
+
+
+STAGES = {
+    stage.name: stage
+    for stage in [
+        GrayscaleStage,
+        BlurStage,
+        ThresholdStage,
+        BoundingBoxStage,
+        HistogramStage,
+        CirclesStage,
+    ]
+}
+
+
+class Pipeline(object):
+
+    """Run the stages in order until one of them is certain of the verdict.
+    """
+
+    def __init__(self, stages):
+        """Instantiate `Pipeline` object with the arguments below.
+
+        :param stages: list of `Stage` objects
+        :raises ValueError: when a stage needs something not provided before
+        """
+        available = {"image"}
+        for stage in stages:
+            missing = set(stage.requires) - available
+            if missing:
+                raise ValueError("stage {!r} requires {}".format(
+                    stage.name, ", ".join(sorted(missing))))
+            available.update(stage.provides)
+        self.stages = list(stages)
+
+    @property
+    def sequential(self):
+        """Tells if the frames have to be processed in order."""
+        return any(stage.sequential for stage in self.stages)
+
+    def process(self, image):
+        """Returns `True` if there's light in the `image`, `False` if not."""
+        frame = {"image": image}
+        for stage in self.stages:
+            verdict = stage.process(frame)
+            if verdict is not None:
+                return bool(verdict)
+        # Nothing certain, so no light.
+        return False
+
+
+def get_default_stages():
+    """Returns the names of the configured stages."""
+    stages = list(PIPELINE.STAGES)
+    if not settings.BOUNDING_BOX and BoundingBoxStage.name in stages:
+        stages.remove(BoundingBoxStage.name)
+    return stages
+
+
+def create_pipeline(stages=None):
+    """Build a pipeline out of stage names or objects (the default
+    configuration when missing).
+    """
+    stages = get_default_stages() if stages is None else stages
+    return Pipeline([STAGES[stage]() if isinstance(stage, str) else stage
+                     for stage in stages])
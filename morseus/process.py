@@ -1,35 +1,108 @@
 """Process images into timed Morse signals."""
 
 
-import collections
-import operator
+import ctypes
+import multiprocessing
 import threading
-import time
-from Queue import Queue
+from Queue import Empty, Queue
 
 import libmorse
 import numpy
-from PIL import ImageFilter
+from PIL import Image
 
-from morseus import settings
+from morseus import logs, pipeline, profiler, settings, signallog, timing
 from morseus.settings import LOGGING
 
 
+PROVISIONAL = settings.PROVISIONAL
+
+MORSE_LETTERS = {
+    ".-": "A", "-...": "B", "-.-.": "C", "-..": "D", ".": "E",
+    "..-.": "F", "--.": "G", "....": "H", "..": "I", ".---": "J",
+    "-.-": "K", ".-..": "L", "--": "M", "-.": "N", "---": "O",
+    ".--.": "P", "--.-": "Q", ".-.": "R", "...": "S", "-": "T",
+    "..-": "U", "...-": "V", ".--": "W", "-..-": "X", "-.--": "Y",
+    "--..": "Z", ".----": "1", "..---": "2", "...--": "3", "....-": "4",
+    ".....": "5", "-....": "6", "--...": "7", "---..": "8", "----.": "9",
+    "-----": "0",
+}
+UNKNOWN_LETTER = "?"
+# Profiling requests of the decoding process, apart from the frames.
+PROFILE = "profile"
+PROFILE_PREFIX = "decoder-process"
+
+
+class ProvisionalLetters(object):
+
+    """Guess the letters from the dots and dashes seen so far, until the
+    translator commits them.
+    """
+
+    def __init__(self):
+        # Current run of the same signal.
+        self._state = False
+        self._duration = 0.0
+        # Dots & dashes of the current letter.
+        self._symbols = ""
+        # Guessed letters which aren't committed yet.
+        self._pending = []
+        # Symbols of the letter in progress, including the ongoing mark.
+        self._current = ""
+
+    @staticmethod
+    def _get_letter(symbols):
+        return MORSE_LETTERS.get(symbols, UNKNOWN_LETTER)
+
+    def add(self, signal, delta, unit):
+        """Update the guess with a new signal lasting `delta` ms, given a
+        Morse `unit` in ms.
+        """
+        if signal != self._state:
+            if self._state:
+                # A mark just ended.
+                dash = self._duration >= PROVISIONAL.DASH * unit
+                self._symbols += "-" if dash else "."
+            self._state = signal
+            self._duration = 0.0
+        self._duration += delta
+
+        symbols = self._symbols
+        if signal:
+            # Count the ongoing mark as well.
+            dash = self._duration >= PROVISIONAL.DASH * unit
+            symbols += "-" if dash else "."
+        elif symbols and self._duration >= PROVISIONAL.GAP * unit:
+            # The letter ended, keep it until confirmed.
+            self._pending.append(self._get_letter(symbols))
+            del self._pending[:-PROVISIONAL.PENDING]
+            self._symbols = symbols = ""
+
+        self._current = symbols
+
+    def confirm(self, letters):
+        """Drop the guesses replaced by the translator `letters`."""
+        count = len("".join(letters).replace(" ", ""))
+        del self._pending[:count]
+
+    @property
+    def text(self):
+        letter = self._get_letter(self._current) if self._current else ""
+        return "".join(self._pending) + letter
+
+
 class Decoder(object):
 
     """Interpret black & white images as Morse code."""
 
-    BW_MODE = "L"
-    MONO_MODE = "1"
-    MONO_THRESHOLD = settings.MONO_THRESHOLD
-    LIGHT_DARK_RATIO = settings.LIGHT_DARK_RATIO
-
     MAX_SIGNALS = 128
 
-    def __init__(self, debug):
+    def __init__(self, debug, log_path=None, stages=None):
         """Instantiate `Decoder` object with the arguments below.
 
         :param bool debug: show debug messages or not
+        :param str log_path: record the received signals into this file
+        :param stages: frame processing stages (names or `pipeline.Stage`
+            objects), the configured ones if missing
         """
         # Last created thread (waiting purposes).
         self._last_thread = None
@@ -38,124 +111,63 @@ class Decoder(object):
             use_logging=LOGGING.USE, debug=debug)
         # Initialize translator coroutine.
         self._translator = self._translate.next()[0]
+        # Keep its logging out of the decoding threads.
+        logs.offload()
         self._translate_lock = threading.Lock()
         # Output queue of string letters.
         self._letters_queue = Queue()
-
-    @staticmethod
-    def _flood_fill(image, node, seen):
-        """Find white spots and return their area."""
-        queue = collections.deque()
-        area = 0
-
-        def add_pos(pos):
-            # Check position and retrieve pixel.
-            width, height = image.size
-            valid = 0 <= pos[0] < width and 0 <= pos[1] < height
-            if not valid:
-                return False
-            pixel = image.getpixel(pos)
-            lin, col = pos
-            if not pixel or seen[lin, col]:
-                return False
-            # White pixel detected.
-            queue.append(pos)
-            seen[lin, col] = True
-            return True
-
-        area += add_pos(node)
-        moves = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        while queue:
-            node = queue.pop()
-            for move in moves:
-                adj = tuple(map(sum, zip(node, move)))
-                area += add_pos(adj)
-
-        return area
-
-    @classmethod
-    def _examine_circles(cls, image, img_area):
-        """Check if we have the usual spot & noise pattern."""
-        areas = []
-        width, height = image.size
-        # Generate the visiting matrix.
-        seen = numpy.zeros((width, height))
-        # Take each white not visited pixel and identify spot from it.
-        for xpix in range(width):
-            for ypix in range(height):
-                pixel = image.getpixel((xpix, ypix))
-                if not pixel or seen[xpix, ypix]:
-                    continue
-                # We've got a non-visited white pixel.
-                area = cls._flood_fill(image, (xpix, ypix), seen)
-                areas.append(area)
-        if not areas:
-            # No spots detected.
-            return False
-
-        # Now compare all the areas in order to check the pattern.
-        main_area = max(areas)
-        areas.remove(main_area)
-        noise = True    # rest of the spots are just noise
-        for area in areas:
-            ratio = float(area) / main_area
-            if ratio > settings.SPOT_NOISE_RATIO:
-                # Not noise anymore.
-                noise = False
-                break
-
-        # If we remain with the `noise`, then we have a recognized pattern.
-        # Also check if the spot isn't too tiny.
-        ratio = float(main_area) / img_area
-        return noise and ratio > settings.SPOT_MIN_RATIO
-
-    def _add_image(self, image, delta, last_thread):
-        """Add or discard new capture for analysing."""
-        # Convert to black & white, then apply blur.
-        image = image.convert(mode=self.BW_MODE).filter(ImageFilter.BLUR)
-        # Convert to monochrome.
-        mono_func = lambda pixel: pixel > self.MONO_THRESHOLD and 255
-        image = image.point(mono_func, mode=self.MONO_MODE)
-        # Get image area and try to crop the extra space.
-        img_area = operator.mul(*image.size)
-        if settings.BOUNDING_BOX:
-            # Crop unnecessary void around the light object.
-            box = image.getbbox()
-            if box:
-                # Check if the new area isn't too small comparing to the
-                # original.
-                box_area = operator.mul(
-                    *map(lambda pair: abs(box[pair[0]] - box[pair[1]]),
-                         [(0, 2), (1, 3)])
-                )
-                if float(box_area) / img_area > settings.BOX_MIN_RATIO:
-                    image = image.crop(box=box)
-
-        # Decide if there's light or dark.
-        hist = image.histogram()
-        blacks = hist[0]
-        if blacks:
-            light_dark = float(hist[-1]) / blacks
-            signal = light_dark > self.LIGHT_DARK_RATIO
-            if not signal and light_dark:
-                signal = self._examine_circles(image, img_area)
-        else:
-            signal = True
-
+        # Letters guessed before being translated.
+        self._provisional = ProvisionalLetters()
+        # Optional recording of the translator input.
+        self._log = None
+        if log_path:
+            self._log = signallog.SignalLog(
+                log_path, get_metrics=self.get_learnt_metrics)
+        # Stages deciding if a frame is light or dark.
+        self._pipeline = pipeline.create_pipeline(stages)
+
+    def _get_signal(self, image):
+        """Decide if there's light or dark in the given `image`."""
+        return self._pipeline.process(image)
+
+    def add_signal(self, signal, delta):
+        """Feed the translator with a new signal lasting `delta` seconds."""
         item = (signal, delta * settings.SECOND)
-        if last_thread:
-            last_thread.join()
         with self._translate_lock:    # isn't necessary, but paranoia reasons
             self._translator, letters = self._translate.send(item)
+            unit = self._translator.unit or settings.UNIT
+            self._provisional.add(signal, item[1], unit)
             if letters:
                 self._letters_queue.put(letters)
                 self._letters_queue.task_done()
+                self._provisional.confirm(letters)
+            if self._log:
+                self._log.write_signal(signal, delta)
+
+    def _add_image(self, image, delta, last_thread):
+        """Add or discard new capture for analysing."""
+        if self._pipeline.sequential:
+            # Wait for the previous frames to pass through the stages first.
+            if last_thread:
+                last_thread.join()
+            signal = self._get_signal(image)
+        else:
+            signal = self._get_signal(image)
+            if last_thread:
+                last_thread.join()
+        self.add_signal(signal, delta)
+
+    def process_image(self, image, delta):
+        """Blocking counterpart of `add_image`."""
+        self._add_image(image, delta, self._last_thread)
+        self._last_thread = None
 
     def add_image(self, *args, **kwargs):
         """Threaded scaffold for adding images into processing."""
         kwargs["last_thread"] = self._last_thread
         thread = threading.Thread(
             target=self._add_image,
+            name="decoder",
             args=args,
             kwargs=kwargs
         )
@@ -170,11 +182,25 @@ class Decoder(object):
             all_letters.extend(letters)
         return "".join(all_letters)
 
+    def get_provisional(self):
+        """Returns the guessed letters not translated yet."""
+        return self._provisional.text
+
     def get_learnt_metrics(self):
         """Returns learnt translator `unit` and `config`."""
         trans = self._translator
         return trans.unit, trans.config
 
+    def flush(self):
+        """Wait for the translator to digest everything received so far and
+        collect its letters.
+        """
+        if self._last_thread:
+            self._last_thread.join()
+        self._translator.wait()
+        # An empty silence just for retrieving the pending letters.
+        self.add_signal(False, 0)
+
     def close(self):
         """Close the translator and free resources."""
         # Wait for the last started thread to finish (and all before it).
@@ -182,6 +208,238 @@ class Decoder(object):
             self._last_thread.join()
         self._translator.wait()
         self._translator.close()
+        if self._log:
+            self._log.write_checkpoint(*self.get_learnt_metrics())
+            self._log.close()
+
+
+def integral_image(mono):
+    """Returns the summed-area table of a boolean matrix, padded with a
+    leading row and column of zeros.
+    """
+    height, width = mono.shape
+    table = numpy.zeros((height + 1, width + 1), dtype=numpy.int32)
+    table[1:, 1:] = mono.cumsum(axis=0, dtype=numpy.int32).cumsum(axis=1)
+    return table
+
+
+def find_light_window(image, size, stride=settings.SEARCH.STRIDE):
+    """Search the whole `image` for the window of `size` holding the most
+    light and return its `(point, size)` or `None` if there's no light.
+
+    Coordinates are following the image rows, so a texture read bottom-up
+    gives back texture coordinates.
+    """
+    gray = numpy.asarray(image.convert(mode=pipeline.BW_MODE))
+    mono = gray > settings.MONO_THRESHOLD
+    height, width = mono.shape
+    win_width, win_height = min(int(size[0]), width), min(int(size[1]), height)
+    table = integral_image(mono)
+
+    # Every window light amount in constant time through the table corners.
+    def get_starts(length, win_length):
+        starts = numpy.arange(0, length - win_length + 1, stride)
+        return numpy.union1d(starts, [length - win_length])
+
+    ys, xs = get_starts(height, win_height), get_starts(width, win_width)
+    sums = (table[numpy.ix_(ys + win_height, xs + win_width)] -
+            table[numpy.ix_(ys, xs + win_width)] -
+            table[numpy.ix_(ys + win_height, xs)] +
+            table[numpy.ix_(ys, xs)])
+    row, col = numpy.unravel_index(sums.argmax(), sums.shape)
+    win_area = win_width * win_height
+    if sums[row, col] <= win_area * settings.SPOT_MIN_RATIO:
+        return None
+
+    # Center the window on the light found inside it.
+    ypos, xpos = ys[row], xs[col]
+    lit_ys, lit_xs = numpy.nonzero(
+        mono[ypos:ypos + win_height, xpos:xpos + win_width])
+    center = xpos + lit_xs.mean(), ypos + lit_ys.mean()
+    point = [
+        int(min(max(center[0] - win_width / 2.0, 0), width - win_width)),
+        int(min(max(center[1] - win_height / 2.0, 0), height - win_height)),
+    ]
+    return point, (win_width, win_height)
+
+
+def _decode_process(debug, log_path, slots, requests, free_slots, conn,
+                    profiled):
+    """Child process target running a plain `Decoder` over shared frames."""
+    # Inherited through forking, but without their writers.
+    logs.restart()
+    decoder = Decoder(debug, log_path=log_path)
+    # The parent needs some metrics right from the start.
+    conn.send(("", decoder.get_learnt_metrics(), ""))
+
+    frames = 0
+    provisional = ""
+    sampler = None
+    while True:
+        request = requests.get()
+        if request is None:
+            # Parent asked us to finish.
+            break
+
+        if request[0] == PROFILE:
+            args = request[1]
+            if args:
+                # Everything runs into the main thread in here.
+                sampler = profiler.Profiler(
+                    *args, threads=("MainThread",), prefix=PROFILE_PREFIX,
+                    on_finish=lambda _: profiled.set()
+                )
+                sampler.start()
+            elif sampler:
+                sampler.stop()
+            continue
+
+        slot, mode, size, data, delta = request
+        if slot is not None:
+            # The frame resides in shared memory and `data` is its length.
+            data = ctypes.string_at(ctypes.addressof(slots[slot]), data)
+            free_slots.put(slot)
+        image = Image.frombytes(mode, size, data)
+        decoder.process_image(image, delta)
+
+        frames += 1
+        letters = decoder.get_letters()
+        last_provisional, provisional = provisional, decoder.get_provisional()
+        if (letters or provisional != last_provisional or
+                not frames % settings.DECODER.METRICS_PERIOD):
+            conn.send((letters, decoder.get_learnt_metrics(), provisional))
+
+    decoder.close()
+    if sampler:
+        sampler.stop()
+    # The process ends without running the exit handlers.
+    logs.close()
+    conn.send((decoder.get_letters(), decoder.get_learnt_metrics(),
+               decoder.get_provisional()))
+    conn.close()
+
+
+class ProcessDecoder(object):
+
+    """Run the whole `Decoder` pipeline into a separate process.
+
+    Frames are passed through shared memory buffers, while letters, learnt
+    metrics and provisional letters are coming back through a pipe.
+    """
+
+    SLOTS = settings.DECODER.SLOTS
+    SLOT_SIZE = settings.DECODER.SLOT_SIZE
+
+    def __init__(self, debug, log_path=None):
+        """Instantiate `ProcessDecoder` object with the arguments below.
+
+        :param bool debug: show debug messages or not
+        :param str log_path: record the received signals into this file
+        """
+        self._slots = [multiprocessing.RawArray(ctypes.c_char, self.SLOT_SIZE)
+                       for _ in range(self.SLOTS)]
+        self._free_slots = multiprocessing.Queue()
+        for slot in range(self.SLOTS):
+            self._free_slots.put(slot)
+        self._requests = multiprocessing.Queue()
+        self._conn, child_conn = multiprocessing.Pipe(duplex=False)
+        # Set when the child wrote its profile.
+        self._profiled = multiprocessing.Event()
+
+        self._process = multiprocessing.Process(
+            target=_decode_process,
+            args=(debug, log_path, self._slots, self._requests,
+                  self._free_slots, child_conn, self._profiled)
+        )
+        self._process.daemon = True
+        self._process.start()
+        child_conn.close()
+
+        # Results received so far from the child.
+        self._conn_lock = threading.Lock()
+        self._letters = []
+        self._metrics = None
+        self._provisional = ""
+
+    def _receive(self, block=False):
+        """Collect everything the child has sent so far."""
+        with self._conn_lock:
+            if self._conn.closed:
+                return
+            while block or self._conn.poll():
+                try:
+                    letters, self._metrics, self._provisional = (
+                        self._conn.recv())
+                except EOFError:
+                    # Child finished and closed its end.
+                    break
+                self._letters.append(letters)
+                block = False
+
+    def add_image(self, image, delta):
+        """Send a new capture to the child process for analysing."""
+        data = image.tobytes()
+        length = len(data)
+        slot = None
+        if length <= self.SLOT_SIZE:
+            try:
+                slot = self._free_slots.get_nowait()
+            except Empty:
+                # The child is lagging behind, so no buffer is free.
+                pass
+        if slot is None:
+            # Send it through the queue instead, as no frame can be dropped
+            # without losing its signal.
+            self._requests.put((None, image.mode, image.size, data, delta))
+            return
+
+        ctypes.memmove(self._slots[slot], data, length)
+        self._requests.put((slot, image.mode, image.size, length, delta))
+
+    def get_letters(self):
+        """Retrieve all received letters so far as a string."""
+        self._receive()
+        with self._conn_lock:
+            letters, self._letters = self._letters, []
+        return "".join(letters)
+
+    def get_provisional(self):
+        """Returns the latest guessed letters not translated yet."""
+        self._receive()
+        return self._provisional
+
+    def get_learnt_metrics(self):
+        """Returns latest learnt translator `unit` and `config`."""
+        self._receive(block=self._metrics is None)
+        return self._metrics
+
+    def start_profile(self, path, window, interval):
+        """Sample the decoding into the child as well (see `Profiler`)."""
+        self._profiled.clear()
+        self._requests.put((PROFILE, (path, window, interval)))
+
+    def stop_profile(self, timeout=None):
+        """End the child profiling and tell if its profile got written."""
+        if self._process.is_alive():
+            self._requests.put((PROFILE, None))
+        return self._profiled.wait(timeout)
+
+    def close(self):
+        """Wait for all the sent frames to be processed and finish the child.
+        """
+        self._requests.put(None)
+        # Drain the pipe while waiting, so the child doesn't block on it.
+        while self._process.is_alive():
+            self._receive()
+            self._process.join(settings.UNIT / settings.SECOND)
+        self._receive()
+        self._conn.close()
+
+
+def create_decoder(debug, log_path=None, separate=settings.DECODER.PROCESS):
+    """Returns a thread or process based decoder."""
+    decoder_class = ProcessDecoder if separate else Decoder
+    return decoder_class(debug, log_path=log_path)
 
 
 class Encoder(object):
@@ -189,7 +447,7 @@ class Encoder(object):
     """Encode text into Morse signals."""
 
     def __init__(self, text, signal_func, stop_event, decoder, debug,
-                 adaptive):
+                 adaptive, unit=None, clock=timing.SYSTEM_CLOCK):
         """Instantiate `Encoder` object with the mandatory arguments below.
 
         :param str text: text to be translated
@@ -200,15 +458,23 @@ class Encoder(object):
         :param decoder: Decoder object used to read latest learnt metrics
         :param bool debug: show debug messages or not
         :param bool adaptive: "talk" in the same way we "listened"
+        :param float unit: explicit Morse unit in ms (when not adaptive)
+        :param clock: time source used for pacing the signals
         """
         self._text = text
         self._signal_func = signal_func
         self._stop_event = stop_event
         self._decoder = decoder
+        self._clock = clock
+        # Computed signals for the entire text.
+        self._timeline = None
 
         # Create translator object for encoding text into Morse code quanta.
         self._translator = libmorse.AlphabetTranslator(
             use_logging=LOGGING.USE, debug=debug)
+        logs.offload()
+        if unit:
+            self._translator.unit = unit
         # Use learnt unit and ratios instead of the default hardcoded ones.
         if adaptive:
             unit, config = decoder.get_learnt_metrics()
@@ -220,23 +486,37 @@ class Encoder(object):
             # sender as closest as it can).
             self._translator.update_ratios(config)
 
+    def get_timeline(self):
+        """Returns the list of `(state, delta)` signals for the whole text,
+        where `delta` is the duration in ms of that `state`.
+        """
+        if self._timeline is None:
+            # Send and process all characters at once.
+            items = list(self._text.upper())
+            for item in items:
+                self._translator.put(item)
+            _, result = libmorse.get_translator_results(
+                self._translator, force_wait=True
+            )
+            self._translator.close()
+            self._timeline = list(result)
+        return self._timeline
+
+    def schedule(self, scheduler, on_finish=None):
+        """Non-blocking alternative of `start`, sending the signals through
+        the given `scheduler.Scheduler` and returning its `Channel`.
+        """
+        return scheduler.add(self.get_timeline(), self._signal_func,
+                             self._stop_event, on_finish=on_finish)
+
     def start(self):
         """Starts the whole process as a blocking call until finish or
         stopped.
         """
-        # Send and process all characters at once.
-        items = list(self._text.upper())
-        for item in items:
-            self._translator.put(item)
-        _, result = libmorse.get_translator_results(
-            self._translator, force_wait=True
-        )
-        self._translator.close()
-
-        # Now send these resulted signals according to their duration.
-        for state, delta in result:
+        # Send the resulted signals according to their duration.
+        for state, delta in self.get_timeline():
             self._signal_func(state)
-            time.sleep(delta / settings.SECOND)
+            self._clock.sleep(delta / settings.SECOND)
             if self._stop_event.is_set():
                 break
 
@@ -0,0 +1,144 @@
+"""Sampling profiler of the capture, decode and encode threads."""
+
+
+import collections
+import os
+import sys
+import threading
+import time
+
+from morseus import settings
+
+
+PROFILING = settings.PROFILING
+
+
+class Profiler(object):
+
+    """Periodically sample the stacks of the chosen threads for a limited time
+    window, then write them in the collapsed ("folded") stacks format.
+    """
+
+    def __init__(self, path, window=PROFILING.WINDOW,
+                 interval=PROFILING.INTERVAL, threads=PROFILING.THREADS,
+                 on_finish=None, prefix=None, processes=()):
+        """Instantiate `Profiler` object with the arguments below.
+
+        :param str path: output file
+        :param float window: maximum recording duration in seconds
+        :param float interval: seconds between samples
+        :param threads: prefixes of the names of the profiled threads
+        :param on_finish: function called with the `path` once written
+        :param str prefix: root frame of every stack
+        :param processes: objects running code into other processes, which
+            are profiled as well through their `start_profile` and
+            `stop_profile` methods
+        """
+        self.path = path
+        self._window = window
+        self._interval = interval
+        self._threads = tuple(threads)
+        self._on_finish = on_finish
+        self._prefix = prefix
+        self._processes = list(processes)
+        # Tells if some of the processes couldn't be profiled.
+        self.incomplete = False
+
+        self._stacks = collections.Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _get_stack(frame):
+        """Returns the function calls from the outermost to the innermost."""
+        stack = []
+        while frame:
+            code = frame.f_code
+            stack.append("{} ({}:{})".format(
+                code.co_name, os.path.basename(code.co_filename),
+                code.co_firstlineno
+            ))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _sample(self):
+        names = {thread.ident: thread.name
+                 for thread in threading.enumerate()}
+        own = threading.current_thread().ident
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident)
+            if ident == own or not name or not name.startswith(self._threads):
+                continue
+            stack = [name] + self._get_stack(frame)
+            if self._prefix:
+                stack.insert(0, self._prefix)
+            self._stacks[";".join(stack)] += 1
+
+    def _get_process_path(self, index):
+        return "{}.{}".format(self.path, index)
+
+    def _merge(self, path):
+        """Add the stacks of another profile file."""
+        with open(path) as stream:
+            for line in stream:
+                stack, count = line.rsplit(None, 1)
+                self._stacks[stack] += int(count)
+        os.remove(path)
+
+    def _write(self):
+        with open(self.path, "w") as stream:
+            for stack, count in sorted(self._stacks.items()):
+                stream.write("{} {}\n".format(stack, count))
+
+    def _run(self):
+        for index, process in enumerate(self._processes):
+            process.start_profile(self._get_process_path(index),
+                                  self._window, self._interval)
+        deadline = time.time() + self._window
+        while time.time() < deadline:
+            self._sample()
+            if self._stop_event.wait(self._interval):
+                break
+
+        for index, process in enumerate(self._processes):
+            if process.stop_profile(PROFILING.TIMEOUT):
+                self._merge(self._get_process_path(index))
+            else:
+                self.incomplete = True
+        self._write()
+        if self._on_finish:
+            self._on_finish(self.path)
+
+    def start(self):
+        """Begin the recording in the background."""
+        self._thread = threading.Thread(target=self._run, name="profiler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """End the recording earlier and wait for the profile to be written.
+        """
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+
+def get_profile_path(directory):
+    """Returns a new timestamped profile path within `directory`."""
+    name = time.strftime("morseus-%Y%m%d-%H%M%S") + PROFILING.EXTENSION
+    return os.path.join(directory, name)
+
+
+def profile(directory, **kwargs):
+    """Start profiling into a new file of `directory` and return the profiler.
+
+    Accepts the same keyword arguments as `Profiler`.
+    """
+    profiler = Profiler(get_profile_path(directory), **kwargs)
+    profiler.start()
+    return profiler
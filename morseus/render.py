@@ -0,0 +1,249 @@
+"""Offline rendering of Morse signals into frames and sound waves."""
+
+
+import argparse
+import contextlib
+import os
+import threading
+import wave
+
+import numpy
+from PIL import Image, ImageDraw, ImageFilter
+
+from morseus import process, settings
+
+
+RENDER = settings.RENDER
+NPY_EXT = ".npy"
+SAMPLE_WIDTH = 2    # bytes per audio sample (16-bit PCM)
+SAMPLE_MAX = 2 ** (8 * SAMPLE_WIDTH - 1) - 1
+
+
+def get_timeline(text, debug=False, unit=None):
+    """Returns the `(state, delta)` signals of the given `text`, sent with a
+    Morse `unit` in ms (the default one if missing).
+    """
+    encoder = process.Encoder(
+        text, None, threading.Event(), None, debug, False, unit=unit)
+    return encoder.get_timeline()
+
+
+def _get_edges(timeline):
+    """Returns the states and the time of the edges (in seconds) between
+    them.
+    """
+    states = numpy.array([state for state, _ in timeline], dtype=float)
+    deltas = numpy.array([delta for _, delta in timeline], dtype=float)
+    edges = numpy.concatenate(([0.0], numpy.cumsum(deltas / settings.SECOND)))
+    return states, edges
+
+
+def get_duration(timeline):
+    """Returns the total duration in seconds of a timeline."""
+    return sum(delta for _, delta in timeline) / settings.SECOND
+
+
+def _light_integral(states, edges, times):
+    """Returns for how long the light was on until each of the `times`."""
+    # Accumulated lighting at every edge, linear in between.
+    lit = numpy.concatenate(([0.0], numpy.cumsum(states * numpy.diff(edges))))
+    return numpy.interp(times, edges, lit)
+
+
+def _get_states(states, edges, times):
+    """Returns the state of the signal at each of the `times`."""
+    index = numpy.searchsorted(edges, times, side="right") - 1
+    return states[numpy.clip(index, 0, len(states) - 1)]
+
+
+def _get_light(states, edges, times, shutter):
+    """Returns the light quantity within [0, 1] seen by each frame starting
+    at `times` and exposed for `shutter` seconds.
+    """
+    if not shutter:
+        # Instant capture.
+        return _get_states(states, edges, times)
+    return (_light_integral(states, edges, times + shutter) -
+            _light_integral(states, edges, times)) / shutter
+
+
+def get_spot_image(size, spot, blur):
+    """Returns the light spot as a float matrix with values within [0, 1]."""
+    width, height = size
+    radius = spot * min(size) / 2.0
+    center = width / 2.0, height / 2.0
+    image = Image.new("L", size)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse([center[0] - radius, center[1] - radius,
+                  center[0] + radius, center[1] + radius], fill=255)
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    return numpy.asarray(image, dtype=numpy.float32) / 255
+
+
+def _get_windows(samples, shape):
+    """Returns every frame sized window of the `samples`, as a view."""
+    stride = samples.strides[0]
+    return numpy.lib.stride_tricks.as_strided(
+        samples, shape=(len(samples) - shape[0] * shape[1] + 1,) + shape,
+        strides=(stride, shape[1] * stride, stride)
+    )
+
+
+def _get_box(image):
+    """Returns the slices of the smallest area holding the non-zero pixels.
+    """
+    rows, cols = numpy.nonzero(image)
+    if not rows.size:
+        return slice(0, 0), slice(0, 0)
+    return (slice(rows.min(), rows.max() + 1),
+            slice(cols.min(), cols.max() + 1))
+
+
+def iter_frames(timeline, fps=RENDER.FPS, size=RENDER.SIZE, spot=RENDER.SPOT,
+                noise=0.0, blur=0.0, exposure=RENDER.EXPOSURE, seed=None,
+                chunk=RENDER.CHUNK, levels=RENDER.LEVELS):
+    """Yield chunks of grayscale frames for the given `timeline`.
+
+    :param timeline: list of `(state, delta)` signals
+    :param int fps: frames per second
+    :param tuple size: width and height of each frame
+    :param float spot: light spot diameter relative to the frame
+    :param float noise: standard deviation of the gaussian sensor noise,
+        relative to the full white
+    :param float blur: gaussian blur radius in pixels of the light spot
+    :param float exposure: fraction of the frame period the shutter is open
+        (0 for an instant capture)
+    :param seed: noise random seed
+    :param int chunk: maximum number of frames per yielded array
+    :param int levels: distinct light levels the frames are made of
+    """
+    states, edges = _get_edges(timeline)
+    count = int(numpy.ceil(edges[-1] * fps))
+    shutter = exposure / float(fps)
+    # Every frame is one of these spot images, plus some noise.
+    spot_image = get_spot_image(size, spot, blur)
+    scale = numpy.linspace(0, 255, levels).astype(numpy.float32)
+    table = numpy.round(scale[:, None, None] * spot_image)
+    rand = numpy.random.RandomState(seed)
+    if noise:
+        # Drawing fresh noise for every frame dominates the rendering time,
+        # so slice a precomputed pool at random offsets instead.
+        samples = rand.normal(0, noise * 255,
+                              spot_image.size * RENDER.NOISE_POOL)
+        samples = numpy.round(samples).astype(numpy.int16)
+        windows = _get_windows(samples, spot_image.shape)
+        # Outside the spot there's only (already clipped) noise, so the
+        # light is added into its box alone.
+        darks = _get_windows(numpy.clip(samples, 0, 255).astype(numpy.uint8),
+                             spot_image.shape)
+        box = (slice(None),) + _get_box(spot_image)
+        windows = windows[box]
+        table = table[box].astype(numpy.int16)
+    else:
+        table = table.astype(numpy.uint8)
+
+    for start in range(0, count, chunk):
+        times = numpy.arange(start, min(start + chunk, count)) / float(fps)
+        light = _get_light(states, edges, times, shutter)
+        index = numpy.round(light * (levels - 1)).astype(numpy.intp)
+        if not noise:
+            yield table[index]
+            continue
+
+        offsets = rand.randint(0, len(darks), len(index))
+        frames = darks[offsets]
+        lit = numpy.nonzero(index)[0]
+        if lit.size:
+            spots = table[index[lit]]
+            spots += windows[offsets[lit]]
+            numpy.clip(spots, 0, 255, out=spots)
+            frames[(lit,) + box[1:]] = spots
+        yield frames
+
+
+def render_frames(timeline, **kwargs):
+    """Returns all the frames of `timeline` as a single stack.
+
+    Accepts the same keyword arguments as `iter_frames`.
+    """
+    chunks = list(iter_frames(timeline, **kwargs))
+    if not chunks:
+        size = kwargs.get("size", RENDER.SIZE)
+        return numpy.zeros((0, size[1], size[0]), dtype=numpy.uint8)
+    return numpy.concatenate(chunks)
+
+
+def save_frames(path, frames, fps=RENDER.FPS):
+    """Save the frames stack as a NumPy file or as an animated image."""
+    if os.path.splitext(path)[1] == NPY_EXT:
+        numpy.save(path, frames)
+        return
+
+    if not len(frames):
+        raise ValueError("no frames to save into {}".format(path))
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(path, save_all=True, append_images=images[1:],
+                   duration=int(round(settings.SECOND / fps)), loop=0)
+
+
+def render_waveform(timeline, rate=RENDER.RATE, tone=RENDER.TONE,
+                    volume=RENDER.VOLUME, ramp=RENDER.RAMP):
+    """Returns the 16-bit PCM samples of the `timeline` as keyed tone."""
+    states, edges = _get_edges(timeline)
+    count = int(numpy.ceil(edges[-1] * rate))
+    times = numpy.arange(count) / float(rate)
+    # State of the signal for every sample.
+    keying = _get_states(states, edges, times)
+    # Soften the edges of the tones.
+    width = int(ramp * rate)
+    if width > 1:
+        keying = numpy.convolve(keying, numpy.ones(width) / width, mode="same")
+
+    samples = volume * keying * numpy.sin(2 * numpy.pi * tone * times)
+    return (samples * SAMPLE_MAX).astype(numpy.int16)
+
+
+def save_waveform(path, samples, rate=RENDER.RATE):
+    """Save PCM samples as a mono WAV file."""
+    with contextlib.closing(wave.open(path, "wb")) as stream:
+        stream.setnchannels(1)
+        stream.setsampwidth(SAMPLE_WIDTH)
+        stream.setframerate(rate)
+        stream.writeframes(samples.astype("<i2").tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render text as Morse light frames and sound.")
+    parser.add_argument("text", help="text to be rendered")
+    parser.add_argument("-v", "--video",
+                        help="frames output (.npy stack or animated image)")
+    parser.add_argument("-a", "--audio", help="WAV output")
+    parser.add_argument("-u", "--unit", type=float, default=settings.UNIT,
+                        help="Morse unit in ms")
+    parser.add_argument("--fps", type=int, default=RENDER.FPS)
+    parser.add_argument("--size", type=int, nargs=2, default=RENDER.SIZE,
+                        metavar=("WIDTH", "HEIGHT"), help="frame size")
+    parser.add_argument("--exposure", type=float, default=RENDER.EXPOSURE,
+                        help="fraction of the frame period the shutter is "
+                             "open (0 for instant captures)")
+    parser.add_argument("--spot", type=float, default=RENDER.SPOT)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--blur", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    timeline = get_timeline(args.text, unit=args.unit)
+    if args.video:
+        frames = render_frames(timeline, fps=args.fps, size=tuple(args.size),
+                               spot=args.spot, noise=args.noise,
+                               blur=args.blur, exposure=args.exposure,
+                               seed=args.seed)
+        save_frames(args.video, frames, fps=args.fps)
+    if args.audio:
+        save_waveform(args.audio, render_waveform(timeline))
+
+
+if __name__ == "__main__":
+    main()
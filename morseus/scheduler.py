@@ -0,0 +1,143 @@
+"""Drive many Morse signal outputs from a single timing thread."""
+
+
+import heapq
+import itertools
+import threading
+
+from morseus import settings, timing
+
+
+class Channel(object):
+
+    """One output of signals driven by a `Scheduler`."""
+
+    def __init__(self, scheduler, timeline, signal_func, stop_event,
+                 on_finish):
+        self._scheduler = scheduler
+        self._timeline = iter(timeline)
+        self._signal_func = signal_func
+        self._stop_event = stop_event
+        self._on_finish = on_finish
+        self._done_event = threading.Event()
+
+    def step(self, deadline):
+        """Emit the next signal and return the deadline of the following one
+        or `None` when finished.
+        """
+        if not self._stop_event.is_set():
+            for state, delta in self._timeline:
+                self._signal_func(state)
+                # Relative to the planned deadline, so errors don't add up.
+                return deadline + delta / settings.SECOND
+
+        # Every time we're ending with a silence.
+        self._signal_func(False)
+        self._done_event.set()
+        if self._on_finish:
+            self._on_finish()
+        return None
+
+    def stop(self):
+        """Interrupt the sending as soon as possible."""
+        self._stop_event.set()
+        self._scheduler.wake(self)
+
+    def wait(self, timeout=None):
+        """Block until the channel finishes."""
+        return self._done_event.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done_event.is_set()
+
+
+class Scheduler(object):
+
+    """Run any number of encoder timelines through one heap of signal edge
+    deadlines, instead of a sleeping thread for each of them.
+    """
+
+    def __init__(self, clock=timing.SYSTEM_CLOCK):
+        self._clock = clock
+        # Heap of `(deadline, order, channel)` items.
+        self._deadlines = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._thread = None
+
+    def _push(self, deadline, channel, wake=True):
+        with self._lock:
+            heapq.heappush(self._deadlines,
+                           (deadline, next(self._counter), channel))
+        if wake:
+            self._wakeup.set()
+
+    def add(self, timeline, signal_func, stop_event=None, on_finish=None):
+        """Start sending a new `(state, delta)` timeline right away.
+
+        :param timeline: signals as returned by `Encoder.get_timeline`
+        :param signal_func: function that is called for each new state
+        :param stop_event: threading event which signals when to stop
+        :param on_finish: function called (from the scheduler thread) when
+            the channel ends on its own or by being stopped
+        :returns: the `Channel` controlling this output
+        :raises RuntimeError: when the scheduler is already closed
+        """
+        channel = Channel(self, timeline, signal_func,
+                          stop_event or threading.Event(), on_finish)
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("scheduler is closed")
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run,
+                                                name="encoder-scheduler")
+                self._thread.daemon = True
+                self._thread.start()
+            heapq.heappush(self._deadlines, (self._clock.time(),
+                                             next(self._counter), channel))
+        self._wakeup.set()
+        return channel
+
+    def wake(self, channel):
+        """Give an immediate turn to `channel`."""
+        self._push(self._clock.time(), channel)
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                # Drop obsolete deadlines of the already stopped channels.
+                while self._deadlines and self._deadlines[0][2].done:
+                    heapq.heappop(self._deadlines)
+                if not self._deadlines:
+                    if self._closing:
+                        break
+                    deadline = None
+                else:
+                    deadline, _, channel = self._deadlines[0]
+                    timeout = deadline - self._clock.time()
+                    if timeout <= 0:
+                        heapq.heappop(self._deadlines)
+
+            if deadline is None or timeout > 0:
+                # Sleep until the closest edge or until something changes.
+                self._clock.wait(self._wakeup,
+                                 None if deadline is None else timeout)
+                continue
+            deadline = channel.step(deadline)
+            if deadline is not None:
+                self._push(deadline, channel, wake=False)
+
+    def close(self):
+        """Stop all the channels and wait for the scheduler to finish."""
+        with self._lock:
+            self._closing = True
+            channels = [item[2] for item in self._deadlines]
+        for channel in channels:
+            channel.stop()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
@@ -13,6 +13,12 @@ MAX_FPS = 30    # maximum number of frames per second supported
 FPS_FACTOR = 3    # multiplied with the lowest computed FPS value
 TIME_DELTA = False    # use own computed time difference
 
+# Skipping of the frames already captured.
+class FRAMES:
+    TIMESTAMPS = True    # use camera frame times for deltas, when available
+    CHECKSUM_STRIDE = 61    # bytes between checksummed pixel samples
+    STALE = UNIT / SECOND / 2    # process a repeated frame after this time
+
 # Pixels above this threshold are considered white.
 MONO_THRESHOLD = 250
 LIGHT_DARK_RATIO = 1.0    # minimum light vs. dark quantity in an image
@@ -21,6 +27,13 @@ BOX_MIN_RATIO = 0.01    # minimum area ratio between box and source
 SPOT_NOISE_RATIO = 0.1    # maximum area ratio between any and the main spot
 SPOT_MIN_RATIO = BOX_MIN_RATIO / 2    # main spot minimum accepted area
 
+# Frame processing stages (by name) deciding light or dark.
+class PIPELINE:
+    STAGES = ["grayscale", "blur", "threshold", "bbox", "histogram", "circles"]
+    ADAPTIVE = False    # threshold following the previous frame's peak
+    PEAK_RATIO = 0.9    # adaptive threshold relative to the peak
+    THRESHOLD_MIN = 128    # adaptive threshold never goes under this
+
 # Sub-area of interest within the whole capture.
 class AREA:
     # How smaller is comparing to original.
@@ -30,6 +43,86 @@ class AREA:
         MIN = 100.0
         MAX = 500.0
 
+# Recording of the received signals.
+class SIGNAL_LOG:
+    ENABLE = False    # keep a log of every receiving session
+    CHECKPOINT = 256    # signals between learnt metrics checkpoints
+    PERIOD = 10.0    # seconds between learnt metrics checkpoints
+    GAP = 1.0    # seconds missing between signals (paused capture)
+    DIRECTORY = "signals"    # within the app's data directory
+    EXTENSION = ".msl"
+
+# Camera resolution fitting the sub-area of interest.
+class RESOLUTION:
+    NEGOTIATE = True    # pick the smallest mode still filling the sub-area
+    DEFAULT = (640, 480)    # used when not negotiating and the upper limit
+    # Common camera modes (width, height).
+    MODES = [
+        (160, 120),
+        (320, 240),
+        (640, 480),
+        (800, 600),
+        (1280, 720),
+        (1920, 1080),
+    ]
+
+# Provisional letters guessed before the translator commits them.
+class PROVISIONAL:
+    DASH = 2.0    # minimum units of a dash
+    GAP = 2.0    # minimum units of silence between letters
+    PENDING = 8    # maximum unconfirmed letters kept
+
+# Received text history.
+class TRANSCRIPT:
+    WINDOW = 2048    # recent characters kept in memory and shown
+    SPILL = True    # write the whole text into a file as well
+    DIRECTORY = "transcripts"    # within the app's data directory
+    EXTENSION = ".txt"
+    INDEX_EXTENSION = ".idx"    # timestamps of the text offsets
+
+# Full-frame light source search.
+class SEARCH:
+    ENABLE = False    # look for the light within the entire frame
+    PERIOD = 1.0    # seconds between searches
+    STRIDE = 4    # pixels between two consecutive examined windows
+
+# Receiving pipeline options.
+class DECODER:
+    PROCESS = False    # run the whole decoding into a separate process
+    SLOTS = 4    # shared memory frame buffers (process mode only)
+    # Bytes per buffer: RGBA region of maximum width in any aspect ratio.
+    SLOT_SIZE = int(AREA.WIDTH.MAX) ** 2 * 4 * 2
+    METRICS_PERIOD = MAX_FPS    # send learnt metrics every such frames
+
+# Offline rendering of Morse signals.
+class RENDER:
+    FPS = MAX_FPS    # frames per second of the rendered video
+    SIZE = (160, 120)    # frame width and height
+    SPOT = 0.3    # light spot diameter relative to the frame height
+    EXPOSURE = 1.0    # fraction of the frame period the shutter is open
+    CHUNK = 256    # frames rendered at once
+    LEVELS = 256    # quantized light levels of the spot
+    NOISE_POOL = 4    # frames worth of noise, sliced at random offsets
+    RATE = 8000    # audio samples per second
+    TONE = 600.0    # audio frequency in Hz
+    VOLUME = 0.8    # amplitude relative to the maximum one
+    RAMP = 0.005    # seconds of fade in/out for each tone (avoids clicks)
+
+# Simulated sending & receiving.
+class LOOPBACK:
+    TAIL = 30    # trailing silence in units, letting the last letters out
+    UNITS = (100, 200, 300)    # swept Morse units in ms
+    NOISES = (0.0, 0.1, 0.2)    # swept camera noise levels
+
+# On-demand sampling profiler.
+class PROFILING:
+    WINDOW = 30.0    # seconds of recording
+    INTERVAL = 0.01    # seconds between stack samples
+    # Profiled threads (by name prefix).
+    THREADS = ("MainThread", "decoder", "encoder")
+    EXTENSION = ".folded"    # collapsed stacks, flame graph tools compatible
+    TIMEOUT = 5.0    # seconds to wait for the decoding process profile
+
 # Choose from different camera providers.
 class CAMERA_PROVIDERS:
     AVFOUNDATION = "avfoundation"
@@ -60,6 +153,13 @@ class LOGGING:
         }
         EXPLICIT = None
 
+    class BUFFER:    # keep records in memory and write them in batches
+        ENABLE = True
+        LOGGER = "libmorse"    # offloaded logger (and its children)
+        CAPACITY = 4096    # maximum records kept
+        PERIOD = 1.0    # seconds between writes
+        DUMP = "morseus-dump.log"    # written when something goes wrong
+
 # Project directory (package parent).
 PROJECT = os.path.normpath(
     os.path.join(
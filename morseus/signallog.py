@@ -0,0 +1,209 @@
+"""Compact append-only log of the timed signals fed to the translator."""
+
+
+import argparse
+import collections
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from morseus import settings
+
+
+SIGNAL_LOG = settings.SIGNAL_LOG
+
+MAGIC = b"MSL2"
+HEADER = struct.Struct("<4sd")    # magic, creation timestamp
+RECORD = struct.Struct("<BI")    # kind, payload
+CHECKPOINT = struct.Struct("<dd")    # timestamp, learnt unit
+
+# Record kinds; signal payload is the duration in microseconds, while a
+# checkpoint one is the length of its body (the struct above followed by the
+# JSON encoded ratios). The timestamp of a checkpoint is the wall time at its
+# place in the stream, so the following signals are timed from it.
+DARK, LIGHT, METRICS = range(3)
+MICRO = 10 ** 6
+ENCODING = "utf-8"
+
+Signal = collections.namedtuple("Signal", ["state", "delta"])
+Checkpoint = collections.namedtuple(
+    "Checkpoint", ["timestamp", "unit", "config"])
+
+
+class SignalLog(object):
+
+    """Writer of `(signal, delta)` items with periodical metrics
+    checkpoints.
+    """
+
+    def __init__(self, path, get_metrics=None,
+                 checkpoint=SIGNAL_LOG.CHECKPOINT, period=SIGNAL_LOG.PERIOD,
+                 gap=SIGNAL_LOG.GAP):
+        """Instantiate `SignalLog` object with the arguments below.
+
+        :param str path: log file, appended to if already existing
+        :param get_metrics: function returning the learnt `(unit, config)`,
+            enabling automatic checkpoints
+        :param int checkpoint: signals between two metrics checkpoints
+        :param float period: seconds between two metrics checkpoints
+        :param float gap: unaccounted seconds between two signals making a
+            new checkpoint (the capture was paused)
+        """
+        self.path = path
+        self._get_metrics = get_metrics
+        self._checkpoint = checkpoint
+        self._period = period
+        self._gap = gap
+        self._count = 0
+        # Wall time of the last signal end and of the last checkpoint.
+        self._last_time = None
+        self._last_checkpoint = None
+        self._lock = threading.Lock()
+
+        new = not os.path.isfile(path) or not os.path.getsize(path)
+        self._stream = open(path, "ab")
+        if new:
+            self._stream.write(HEADER.pack(MAGIC, time.time()))
+
+    def _checkpoint_due(self, timestamp):
+        if self._checkpoint and not self._count % self._checkpoint:
+            return True
+        return timestamp - self._last_checkpoint >= self._period
+
+    def write_signal(self, signal, delta, timestamp=None):
+        """Append a signal lasting `delta` seconds and ending at `timestamp`,
+        along with the due checkpoints.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        start = timestamp - delta
+        if self._get_metrics and (self._last_time is None or
+                                  start - self._last_time > self._gap):
+            # Place the signals following a pause in time.
+            self.write_checkpoint(*self._get_metrics(), timestamp=start)
+
+        kind = LIGHT if signal else DARK
+        micros = min(int(round(delta * MICRO)), 2 ** 32 - 1)
+        with self._lock:
+            self._stream.write(RECORD.pack(kind, micros))
+            self._count += 1
+        self._last_time = timestamp
+
+        if self._get_metrics and self._checkpoint_due(timestamp):
+            self.write_checkpoint(*self._get_metrics(), timestamp=timestamp)
+
+    def write_checkpoint(self, unit, config, timestamp=None):
+        """Append the learnt metrics of the translator, where `config` is
+        the mapping of ratios.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        unit = float("nan") if unit is None else unit
+        try:
+            config = json.dumps(config, sort_keys=True).encode(ENCODING)
+        except (TypeError, ValueError):
+            config = b""
+        body = CHECKPOINT.pack(timestamp, unit) + config
+        with self._lock:
+            self._stream.write(RECORD.pack(METRICS, len(body)) + body)
+            # Don't lose more than what's between two checkpoints.
+            self._stream.flush()
+        self._last_checkpoint = timestamp
+
+    def flush(self):
+        with self._lock:
+            self._stream.flush()
+
+    def close(self):
+        with self._lock:
+            self._stream.close()
+
+
+def read(path):
+    """Yield the `Signal` and `Checkpoint` records found in a log file."""
+    with open(path, "rb") as stream:
+        size = os.fstat(stream.fileno()).st_size
+        if size < HEADER.size:
+            return
+        data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, _ = HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise ValueError("{} is not a signal log".format(path))
+
+            offset = HEADER.size
+            # A partially written last record is ignored.
+            while offset + RECORD.size <= size:
+                kind, payload = RECORD.unpack_from(data, offset)
+                offset += RECORD.size
+                if kind != METRICS:
+                    yield Signal(kind == LIGHT, float(payload) / MICRO)
+                    continue
+
+                if offset + payload > size:
+                    break
+                timestamp, unit = CHECKPOINT.unpack_from(data, offset)
+                config = data[offset + CHECKPOINT.size:offset + payload]
+                config = (json.loads(config.decode(ENCODING)) if config
+                          else None)
+                offset += payload
+                yield Checkpoint(timestamp, None if unit != unit else unit,
+                                 config)
+        finally:
+            data.close()
+
+
+def iter_timed(path):
+    """Yield `(timestamp, signal)` pairs, with the wall time each signal of
+    a log file started at.
+    """
+    timestamp = None
+    for record in read(path):
+        if isinstance(record, Checkpoint):
+            timestamp = record.timestamp
+        elif timestamp is not None:
+            yield timestamp, record
+            timestamp += record.delta
+
+
+def replay(path, debug=False):
+    """Push a whole log through a new translator and return the letters."""
+    # The decoder is the one writing these logs, so avoid a circular import.
+    from morseus import process
+
+    decoder = process.Decoder(debug)
+    letters = []
+    for record in read(path):
+        if isinstance(record, Signal):
+            decoder.add_signal(*record)
+            letters.append(decoder.get_letters())
+    decoder.flush()
+    letters.append(decoder.get_letters())
+    decoder.close()
+    return "".join(letters)
+
+
+def get_log_path(directory):
+    """Returns a new timestamped log path within `directory`."""
+    name = time.strftime("morseus-%Y%m%d-%H%M%S") + SIGNAL_LOG.EXTENSION
+    return os.path.join(directory, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-decode recorded signal logs.")
+    parser.add_argument("paths", nargs="+", metavar="path",
+                        help="signal log file")
+    parser.add_argument("-d", "--debug", action="store_true",
+                        help="show translator debug messages")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        started = time.time()
+        letters = replay(path, debug=args.debug)
+        print("{} ({:.2f}s): {}".format(path, time.time() - started, letters))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Injectable clocks for every timing decision."""
+
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class SystemClock(object):
+
+    """Wall clock used by default."""
+
+    @staticmethod
+    def time():
+        return time.time()
+
+    @staticmethod
+    def sleep(seconds):
+        time.sleep(seconds)
+
+    @staticmethod
+    def wait(event, timeout):
+        """Wait for the threading `event` at most `timeout` seconds."""
+        return event.wait(timeout)
+
+
+class ClockEvent(object):
+
+    """Periodic callback scheduled on a `VirtualClock`."""
+
+    def __init__(self, callback, period):
+        self.callback = callback
+        self.period = period
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class VirtualClock(object):
+
+    """Simulated clock which advances only when slept on, firing the
+    scheduled intervals in between, just like Kivy's `Clock` would do.
+
+    It can be shared between threads, but the callbacks run in the thread
+    advancing the time.
+    """
+
+    def __init__(self, start=0.0):
+        self._now = start
+        # Heap of `(deadline, order, event)` items.
+        self._events = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def time(self):
+        with self._lock:
+            return self._now
+
+    def schedule_interval(self, callback, period):
+        """Call `callback(delta)` every `period` seconds of simulated time."""
+        event = ClockEvent(callback, period)
+        with self._lock:
+            self._push(self._now + period, event)
+        return event
+
+    def _push(self, deadline, event):
+        heapq.heappush(self._events, (deadline, next(self._counter), event))
+
+    def _pop_due(self, target):
+        with self._lock:
+            while self._events and self._events[0][0] <= target:
+                deadline, _, event = heapq.heappop(self._events)
+                if event.cancelled:
+                    continue
+                self._now = max(self._now, deadline)
+                self._push(deadline + event.period, event)
+                return event
+            self._now = max(self._now, target)
+            return None
+
+    def advance(self, seconds):
+        """Move the time forward while running the due callbacks."""
+        with self._lock:
+            target = self._now + seconds
+        while True:
+            # The callbacks are free to use the clock as well.
+            event = self._pop_due(target)
+            if not event:
+                break
+            event.callback(event.period)
+
+    sleep = advance
+
+    def wait(self, event, timeout):
+        """Same as `SystemClock.wait`, except that only the scheduled
+        callbacks are able to set the `event` in the meantime. Without a
+        `timeout` there's nothing to simulate, so it really blocks until
+        another thread sets the `event`.
+        """
+        if timeout is None:
+            return event.wait()
+        if not event.is_set():
+            self.advance(timeout)
+        return event.is_set()
+
+
+SYSTEM_CLOCK = SystemClock()
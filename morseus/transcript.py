@@ -0,0 +1,114 @@
+"""Memory bounded history of the received text."""
+
+
+import bisect
+import mmap
+import os
+import struct
+import time
+
+from morseus import settings
+
+
+TRANSCRIPT = settings.TRANSCRIPT
+
+ENCODING = "utf-8"
+INDEX = struct.Struct("<dQ")    # timestamp, text offset in bytes
+
+
+class Transcript(object):
+
+    """Keep only a recent window of the text in memory, while the whole text
+    goes into an append-only file indexed by time.
+    """
+
+    def __init__(self, path=None, window=TRANSCRIPT.WINDOW):
+        """Instantiate `Transcript` object with the arguments below.
+
+        :param str path: text file (no spilling if missing)
+        :param int window: number of recent characters kept in memory
+        """
+        self.path = path
+        self.text = ""
+        self._window = window
+        self._stream = self._index = None
+        self._offset = 0
+        if path:
+            self._stream = open(path, "ab")
+            self._index = open(path + TRANSCRIPT.INDEX_EXTENSION, "ab")
+            self._offset = self._stream.tell()
+
+    def append(self, letters, timestamp=None):
+        """Add newly received `letters` to the transcript."""
+        if not letters:
+            return
+
+        if self._stream:
+            timestamp = time.time() if timestamp is None else timestamp
+            data = letters.encode(ENCODING)
+            self._index.write(INDEX.pack(timestamp, self._offset))
+            self._stream.write(data)
+            self._offset += len(data)
+            self._index.flush()
+            self._stream.flush()
+        self.text = (self.text + letters)[-self._window:]
+
+    def close(self):
+        if self._stream:
+            self._stream.close()
+            self._index.close()
+
+
+class _Timestamps(object):
+
+    """Sequence view over the timestamps of a memory mapped index."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def __len__(self):
+        return len(self._data) // INDEX.size
+
+    def __getitem__(self, position):
+        return INDEX.unpack_from(self._data, position * INDEX.size)[0]
+
+    def get_offset(self, position):
+        return INDEX.unpack_from(self._data, position * INDEX.size)[1]
+
+
+def read(path, start=None, end=None):
+    """Returns the text of a transcript file received between the `start`
+    and `end` timestamps.
+    """
+    index_path = path + TRANSCRIPT.INDEX_EXTENSION
+    with open(path, "rb") as stream:
+        size = os.fstat(stream.fileno()).st_size
+        if not size:
+            return u""
+        begin, finish = 0, size
+
+        with open(index_path, "rb") as index:
+            if os.fstat(index.fileno()).st_size >= INDEX.size:
+                data = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    times = _Timestamps(data)
+                    # Binary search for the first and the last entries.
+                    if start is not None:
+                        position = bisect.bisect_left(times, start)
+                        begin = (times.get_offset(position)
+                                 if position < len(times) else size)
+                    if end is not None:
+                        position = bisect.bisect_right(times, end)
+                        finish = (times.get_offset(position)
+                                  if position < len(times) else size)
+                finally:
+                    data.close()
+
+        stream.seek(begin)
+        return stream.read(max(finish - begin, 0)).decode(ENCODING)
+
+
+def get_transcript_path(directory):
+    """Returns a new timestamped transcript path within `directory`."""
+    name = time.strftime("morseus-%Y%m%d-%H%M%S") + TRANSCRIPT.EXTENSION
+    return os.path.join(directory, name)
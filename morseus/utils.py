@@ -20,6 +20,21 @@ def calc_morse_fps():
     return min(int(settings.FPS_FACTOR * fps), settings.MAX_FPS)
 
 
+def negotiate_resolution(box_ratio, modes=settings.RESOLUTION.MODES,
+                         limit=settings.RESOLUTION.DEFAULT):
+    """Returns the smallest camera mode whose sub-area of interest doesn't
+    go under the minimum width, without exceeding the `limit` mode.
+    """
+    area = lambda mode: mode[0] * mode[1]
+    modes = sorted((mode for mode in modes if area(mode) <= area(limit)),
+                   key=area)
+    for mode in modes:
+        if mode[0] * box_ratio >= settings.AREA.WIDTH.MIN:
+            return mode
+    # Any bigger capture costs more than what the focus area gains.
+    return limit
+
+
 def dim_transform(first, second, transform):
     """Adapt `transform` dimensions following `first` to `second` rules."""
     if not all(itertools.chain(first, second)):
@@ -0,0 +1,87 @@
+import operator
+import random
+import unittest
+
+import numpy
+from PIL import Image, ImageFilter
+
+from morseus import pipeline, settings
+
+
+def get_baseline_signal(image):
+    """Light or dark decision as it was made before having the stages."""
+    image = image.convert(mode="L").filter(ImageFilter.BLUR)
+    mono_func = lambda pixel: pixel > settings.MONO_THRESHOLD and 255
+    image = image.point(mono_func, mode="1")
+    img_area = operator.mul(*image.size)
+    if settings.BOUNDING_BOX:
+        box = image.getbbox()
+        if box:
+            box_area = operator.mul(
+                *map(lambda pair: abs(box[pair[0]] - box[pair[1]]),
+                     [(0, 2), (1, 3)])
+            )
+            if float(box_area) / img_area > settings.BOX_MIN_RATIO:
+                image = image.crop(box=box)
+
+    hist = image.histogram()
+    blacks = hist[0]
+    if blacks:
+        light_dark = float(hist[-1]) / blacks
+        signal = light_dark > settings.LIGHT_DARK_RATIO
+        if not signal and light_dark:
+            signal = pipeline.CirclesStage._examine_circles(image, img_area)
+    else:
+        signal = True
+    return signal
+
+
+def get_frames(count, size=(64, 48), seed=0):
+    """Generate RGBA captures of light spots, noise and darkness."""
+    rand = random.Random(seed)
+    noise = numpy.random.RandomState(seed)
+    width, height = size
+    ycoords, xcoords = numpy.mgrid[:height, :width]
+    for _ in range(count):
+        pixels = noise.randint(0, rand.choice([64, 200]),
+                               size=(height, width)).astype(numpy.float64)
+        for _ in range(rand.randint(0, 3)):
+            center = rand.uniform(0, width), rand.uniform(0, height)
+            radius = rand.uniform(1, height / 2.0)
+            inside = ((xcoords - center[0]) ** 2 +
+                      (ycoords - center[1]) ** 2) <= radius ** 2
+            pixels[inside] = rand.uniform(200, 255)
+        # Sparse bright dots.
+        dots = noise.random_sample((height, width)) < rand.choice([0, 0.01])
+        pixels[dots] = 255
+        gray = pixels.clip(0, 255).astype(numpy.uint8)
+        rgba = numpy.dstack([gray, gray, gray,
+                             numpy.full_like(gray, 255)])
+        yield Image.fromarray(rgba, mode="RGBA")
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_default_matches_baseline(self):
+        pipe = pipeline.create_pipeline()
+        verdicts = []
+        for image in get_frames(300):
+            verdict = pipe.process(image)
+            self.assertEqual(get_baseline_signal(image), verdict)
+            verdicts.append(verdict)
+        # Both outcomes have to be covered.
+        self.assertTrue(any(verdicts))
+        self.assertFalse(all(verdicts))
+
+    def test_missing_requirement(self):
+        with self.assertRaises(ValueError):
+            pipeline.create_pipeline(["grayscale", "bbox"])
+
+    def test_sequential(self):
+        self.assertFalse(pipeline.create_pipeline().sequential)
+        stages = [pipeline.ThresholdStage(adaptive=True)]
+        self.assertTrue(pipeline.create_pipeline(stages).sequential)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from morseus import process, settings
+
+
+UNIT = 100.0
+
+
+class TestProvisionalLetters(unittest.TestCase):
+
+    def setUp(self):
+        self.provisional = process.ProvisionalLetters()
+
+    def _add(self, *signals):
+        for signal, units in signals:
+            self.provisional.add(signal, units * UNIT, UNIT)
+        return self.provisional.text
+
+    def _add_letter(self, symbols):
+        for symbol in symbols:
+            self._add((True, 1 if symbol == "." else 3), (False, 1))
+        return self._add((False, 2))
+
+    def test_letter_and_gap(self):
+        self.assertEqual("E", self._add((True, 1)))
+        self.assertEqual("E", self._add((False, 1)))
+        # Dash still in progress.
+        self.assertEqual("A", self._add((True, 3)))
+        self.assertEqual("A", self._add((False, 3)))
+        self.provisional.confirm("A")
+        self.assertEqual("", self.provisional.text)
+
+    def test_ongoing_mark(self):
+        self.assertEqual("E", self._add((True, 1)))
+        self.assertEqual("E", self._add((True, 0.5)))
+        # Long enough to become a dash.
+        self.assertEqual("T", self._add((True, 0.5)))
+
+    def test_gap_threshold(self):
+        gap = settings.PROVISIONAL.GAP
+        self._add((True, 1), (False, gap - 0.5))
+        # Still the same letter.
+        self.assertEqual("I", self._add((True, 1)))
+        self._add((False, gap))
+        # A new one.
+        self.assertEqual("IE", self._add((True, 1)))
+
+    def test_silence_only(self):
+        self.assertEqual("", self._add((False, 10)))
+
+    def test_unknown(self):
+        self.assertEqual(process.UNKNOWN_LETTER, self._add_letter("......"))
+
+    def test_confirm_by_count(self):
+        self._add_letter(".")
+        self._add_letter("-")
+        self.assertEqual("ETA", self._add_letter(".-"))
+        # Spaces aren't guessed, so they don't count.
+        self.provisional.confirm(["E", " "])
+        self.assertEqual("TA", self.provisional.text)
+        self.provisional.confirm("TA")
+        self.assertEqual("", self.provisional.text)
+
+    def test_pending_limit(self):
+        limit = settings.PROVISIONAL.PENDING
+        for symbols in ["."] * limit + ["-"]:
+            self._add_letter(symbols)
+        self.assertEqual("E" * (limit - 1) + "T", self.provisional.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
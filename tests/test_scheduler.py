@@ -0,0 +1,150 @@
+import threading
+import unittest
+
+from morseus import scheduler, settings, timing
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = timing.VirtualClock()
+        self.scheduler = scheduler.Scheduler(clock=self.clock)
+
+    def tearDown(self):
+        self.scheduler.close()
+
+    def _send(self, timeline):
+        signals = []
+        channel = self.scheduler.add(timeline, signals.append)
+        self.assertTrue(channel.wait(2))
+        return signals
+
+    def test_channels_one_after_another(self):
+        unit = settings.UNIT
+        timeline = [(True, unit), (False, unit), (True, 3 * unit)]
+
+        started = self.clock.time()
+        self.assertEqual([True, False, True, False], self._send(timeline))
+        self.assertAlmostEqual(5 * unit / settings.SECOND,
+                               self.clock.time() - started)
+        # The idle scheduler has to pick up a new channel.
+        self.assertEqual([True, False], self._send(timeline[:1]))
+
+    def _add_all(self, units, on_signal=None):
+        """Start a channel for each unit at the same moment and return them
+        along with the `(time, state)` edges they've sent.
+        """
+        # Keep the scheduler busy until every channel is added.
+        gate = threading.Event()
+        self.scheduler.add([(False, 0)], lambda _: gate.wait(2))
+        started = self.clock.time()
+        channels, edges = [], []
+        for index, unit in enumerate(units):
+            signals = []
+
+            def signal_func(state, index=index, signals=signals):
+                signals.append((self.clock.time() - started, state))
+                if on_signal:
+                    on_signal(channels, index, signals)
+
+            channels.append(self.scheduler.add(self._get_timeline(unit),
+                                               signal_func))
+            edges.append(signals)
+        gate.set()
+        for channel in channels:
+            self.assertTrue(channel.wait(2))
+        return channels, edges
+
+    @staticmethod
+    def _get_timeline(unit):
+        return [(True, unit), (False, unit), (True, 3 * unit),
+                (False, unit), (True, unit)]
+
+    def _check_edges(self, unit, edges):
+        expected, moment = [], 0.0
+        for state, delta in self._get_timeline(unit) + [(False, 0)]:
+            expected.append((moment, state))
+            moment += delta / settings.SECOND
+        self.assertEqual([state for _, state in expected],
+                         [state for _, state in edges])
+        for (moment, _), (edge, _) in zip(expected, edges):
+            self.assertAlmostEqual(moment, edge)
+
+    def test_overlapping_channels(self):
+        units = [100.0, 170.0, 230.0]
+        _, edges = self._add_all(units)
+        for unit, channel_edges in zip(units, edges):
+            self._check_edges(unit, channel_edges)
+
+    def test_stop_one_of_many(self):
+        units = [100.0, 170.0, 230.0]
+
+        def on_signal(channels, index, signals):
+            # Stop the middle channel after its second edge.
+            if index == 1 and len(signals) == 2:
+                channels[index].stop()
+
+        _, edges = self._add_all(units, on_signal=on_signal)
+        self._check_edges(units[0], edges[0])
+        self._check_edges(units[2], edges[2])
+        # Ended right away with a silence.
+        moment = units[1] / settings.SECOND
+        self.assertEqual([(0.0, True), (moment, False), (moment, False)],
+                         edges[1])
+
+    def test_concurrent_add(self):
+        clock = timing.SystemClock()
+        self.scheduler = scheduler.Scheduler(clock=clock)
+        channels = []
+        barrier = threading.Event()
+
+        def add():
+            barrier.wait()
+            channels.append(self.scheduler.add([(True, 1)], lambda _: None))
+
+        threads = [threading.Thread(target=add) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        barrier.set()
+        for thread in threads:
+            thread.join()
+        for channel in channels:
+            self.assertTrue(channel.wait(2))
+        names = [thread.name for thread in threading.enumerate()]
+        self.assertEqual(1, names.count("encoder-scheduler"))
+
+    def test_add_after_close(self):
+        self.scheduler.close()
+        with self.assertRaises(RuntimeError):
+            self.scheduler.add([(True, 1)], lambda _: None)
+
+    def test_stop(self):
+        stop_event = threading.Event()
+        stop_event.set()
+        signals = []
+        channel = self.scheduler.add([(True, settings.UNIT)], signals.append,
+                                     stop_event=stop_event)
+        self.assertTrue(channel.wait(2))
+        self.assertEqual([False], signals)
+
+
+class TestVirtualClock(unittest.TestCase):
+
+    def test_wait_without_timeout(self):
+        clock = timing.VirtualClock()
+        event = threading.Event()
+        threading.Timer(0.05, event.set).start()
+        self.assertTrue(clock.wait(event, None))
+        self.assertEqual(0.0, clock.time())
+
+    def test_intervals(self):
+        clock = timing.VirtualClock()
+        deltas = []
+        clock.schedule_interval(deltas.append, 0.25)
+        clock.advance(1.1)
+        self.assertEqual([0.25] * 4, deltas)
+        self.assertAlmostEqual(1.1, clock.time())
+
+
+if __name__ == "__main__":
+    unittest.main()
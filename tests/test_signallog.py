@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from morseus import signallog
+
+
+class TestSignalLog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.msl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, signals, metrics=None):
+        log = signallog.SignalLog(self.path, checkpoint=0)
+        for signal in signals:
+            log.write_signal(*signal)
+        if metrics:
+            log.write_checkpoint(*metrics, timestamp=1.5)
+        log.close()
+
+    def _read(self):
+        return list(signallog.read(self.path))
+
+    def test_record_layout(self):
+        self._write([(True, 0.3), (False, 0.1)])
+        with open(self.path, "rb") as stream:
+            data = stream.read()
+
+        header = signallog.HEADER.size
+        self.assertEqual(signallog.MAGIC, data[:4])
+        self.assertEqual(header + 2 * signallog.RECORD.size, len(data))
+        self.assertEqual((signallog.LIGHT, 300000),
+                         signallog.RECORD.unpack_from(data, header))
+        self.assertEqual(
+            (signallog.DARK, 100000),
+            signallog.RECORD.unpack_from(
+                data, header + signallog.RECORD.size)
+        )
+
+    def test_round_trip(self):
+        config = {"dash": 3.0, "dot": 1.0}
+        self._write([(True, 0.3), (False, 0.1)], metrics=(120.0, config))
+        signal, silence, checkpoint = self._read()
+
+        self.assertEqual((True, 0.3), signal)
+        self.assertEqual((False, 0.1), silence)
+        self.assertEqual(1.5, checkpoint.timestamp)
+        self.assertEqual(120.0, checkpoint.unit)
+        self.assertEqual(config, checkpoint.config)
+
+    def test_nan_unit(self):
+        self._write([], metrics=(None, {}))
+        checkpoint, = self._read()
+        self.assertIsNone(checkpoint.unit)
+        self.assertEqual({}, checkpoint.config)
+
+    def test_unserializable_config(self):
+        self._write([], metrics=(100.0, object()))
+        checkpoint, = self._read()
+        self.assertEqual(100.0, checkpoint.unit)
+        self.assertIsNone(checkpoint.config)
+
+    def test_partial_last_record(self):
+        self._write([(True, 0.3), (False, 0.1)], metrics=(100.0, {}))
+        size = os.path.getsize(self.path)
+        for cut in (1, signallog.CHECKPOINT.size):
+            with open(self.path, "r+b") as stream:
+                stream.truncate(size - cut)
+            # The incomplete checkpoint is left out.
+            self.assertEqual([(True, 0.3), (False, 0.1)], self._read())
+
+        size = (signallog.HEADER.size + 2 * signallog.RECORD.size - 1)
+        with open(self.path, "r+b") as stream:
+            stream.truncate(size)
+        self.assertEqual([(True, 0.3)], self._read())
+
+    def test_timed_signals(self):
+        metrics = lambda: (100.0, {})
+        log = signallog.SignalLog(self.path, get_metrics=metrics,
+                                  checkpoint=0, period=60, gap=1)
+        log.write_signal(True, 0.25, timestamp=10.25)
+        log.write_signal(False, 0.5, timestamp=10.75)
+        # Capture paused for a while.
+        log.write_signal(True, 0.25, timestamp=20.0)
+        log.write_signal(False, 0.25, timestamp=20.25)
+        # Checkpoints are written through right away.
+        kinds = [type(record) for record in self._read()]
+        self.assertEqual([signallog.Checkpoint, signallog.Signal,
+                          signallog.Signal, signallog.Checkpoint], kinds)
+        log.close()
+
+        self.assertEqual(
+            [(10.0, (True, 0.25)), (10.25, (False, 0.5)),
+             (19.75, (True, 0.25)), (20.0, (False, 0.25))],
+            list(signallog.iter_timed(self.path))
+        )
+
+    def test_periodic_checkpoints(self):
+        log = signallog.SignalLog(self.path, get_metrics=lambda: (None, {}),
+                                  checkpoint=4, period=0.6, gap=1)
+        timestamp = 0.0
+        for signal in [True, False] * 3:
+            timestamp += 0.25
+            log.write_signal(signal, 0.25, timestamp=timestamp)
+        log.close()
+        # First one places the beginning, then by time and by count.
+        times = [record.timestamp for record in self._read()
+                 if isinstance(record, signallog.Checkpoint)]
+        self.assertEqual([0.0, 0.75, 1.0], times)
+
+    def test_not_a_log(self):
+        with open(self.path, "wb") as stream:
+            stream.write(b"\0" * signallog.HEADER.size)
+        with self.assertRaises(ValueError):
+            self._read()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from morseus import transcript
+
+
+class TestTranscript(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.txt")
+        # Received at the 1st, 2nd and then 3rd second, after reopening.
+        self._write([("AB", 1.0), ("CD", 2.0)])
+        self._write([("EF", 3.0)])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, items):
+        text = transcript.Transcript(self.path)
+        for letters, timestamp in items:
+            text.append(letters, timestamp=timestamp)
+        text.close()
+
+    def _read(self, start=None, end=None):
+        return transcript.read(self.path, start=start, end=end)
+
+    def test_reopen_and_append(self):
+        self.assertEqual("ABCDEF", self._read())
+        # Offsets continue after the existing text.
+        self.assertEqual("EF", self._read(start=3.0))
+
+    def test_inside_range(self):
+        self.assertEqual("CD", self._read(start=2.0, end=2.0))
+        self.assertEqual("CD", self._read(start=1.5, end=2.5))
+        self.assertEqual("CDEF", self._read(start=1.5))
+        self.assertEqual("ABCD", self._read(end=2.5))
+
+    def test_outside_range(self):
+        self.assertEqual("ABCDEF", self._read(start=0.0, end=10.0))
+        self.assertEqual("", self._read(start=4.0))
+        self.assertEqual("", self._read(end=0.5))
+        self.assertEqual("", self._read(start=2.5, end=2.7))
+
+    def test_memory_window(self):
+        text = transcript.Transcript(window=3)
+        text.append("ABCD")
+        text.append("E")
+        self.assertEqual("CDE", text.text)
+
+    def test_empty(self):
+        path = os.path.join(self.directory, "empty.txt")
+        transcript.Transcript(path).close()
+        self.assertEqual("", transcript.read(path, start=1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()